@@ -0,0 +1,39 @@
+import logging
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+logger = logging.getLogger(__name__)
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class BackgroundTask(QThread):
+    progress = pyqtSignal(int, str)
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, function, parent=None):
+        super().__init__(parent)
+        self.function = function
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def report(self, percent, message=""):
+        if self.cancelled:
+            raise TaskCancelled()
+        self.progress.emit(int(percent), message)
+
+    def run(self):
+        try:
+            result = self.function(self.report)
+        except TaskCancelled:
+            self.failed.emit("Операция отменена")
+        except Exception as e:
+            logger.error(f"Error {e} in a background task")
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(result)
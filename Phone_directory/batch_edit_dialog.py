@@ -0,0 +1,194 @@
+import logging
+import re
+from PyQt5.QtWidgets import (
+    QDialog, QFormLayout, QLineEdit, QPushButton, QMessageBox, QVBoxLayout, QHBoxLayout,
+    QCheckBox, QListWidget, QLabel
+)
+from dictionary_resolver import DICTIONARY_COLUMNS
+from value_completer import ValueCompleter
+
+
+logger = logging.getLogger(__name__)
+
+UID_PATTERN = re.compile(r'\d+')
+BATCH_FIELDS = {
+    'Фамилия': 'surnames',
+    'Имя': 'names',
+    'Отчество': 'patronymics',
+    'Город': 'cities',
+    'Улица': 'streets',
+    'Дом': 'house',
+    'Телефон': 'telephone',
+}
+
+
+class BatchEditDialog(QDialog):
+    def __init__(self, db, uids=(), completions=None):
+        super().__init__()
+        self.db = db
+        self.operations = []
+        self.changed_uids = []
+        self.setWindowTitle("Пакетная правка")
+        self.resize(500, 500)
+
+        self.layout = QVBoxLayout()
+        self.setLayout(self.layout)
+
+        self.uids_input = QLineEdit(self)
+        self.uids_input.setPlaceholderText("ID через запятую или пробел")
+        self.uids_input.setText(", ".join(map(str, uids)))
+        self.layout.addWidget(QLabel("ID записей:", self))
+        self.layout.addWidget(self.uids_input)
+
+        self.form_layout = QFormLayout()
+        self.field_inputs = {}
+        for header in BATCH_FIELDS:
+            checkbox = QCheckBox(header, self)
+            line_edit = QLineEdit(self)
+            line_edit.setEnabled(False)
+            checkbox.toggled.connect(line_edit.setEnabled)
+            if completions is not None and BATCH_FIELDS[header] in DICTIONARY_COLUMNS:
+                ValueCompleter(completions, BATCH_FIELDS[header], line_edit)
+            self.form_layout.addRow(checkbox, line_edit)
+            self.field_inputs[header] = (checkbox, line_edit)
+        self.layout.addLayout(self.form_layout)
+
+        self.stage_layout = QHBoxLayout()
+
+        self.stage_update_button = QPushButton("Добавить изменение", self)
+        self.stage_update_button.clicked.connect(self.stage_update)
+        self.stage_layout.addWidget(self.stage_update_button)
+
+        self.stage_delete_button = QPushButton("Добавить удаление", self)
+        self.stage_delete_button.clicked.connect(self.stage_delete)
+        self.stage_layout.addWidget(self.stage_delete_button)
+
+        self.layout.addLayout(self.stage_layout)
+
+        self.operations_list = QListWidget(self)
+        self.layout.addWidget(self.operations_list)
+
+        self.buttons_layout = QHBoxLayout()
+
+        self.remove_button = QPushButton("Убрать из пакета", self)
+        self.remove_button.clicked.connect(self.remove_operation)
+        self.buttons_layout.addWidget(self.remove_button)
+
+        self.apply_button = QPushButton("Применить", self)
+        self.apply_button.clicked.connect(self.apply_batch)
+        self.buttons_layout.addWidget(self.apply_button)
+
+        self.layout.addLayout(self.buttons_layout)
+
+    def selected_uids(self):
+        uids = list(dict.fromkeys(int(uid) for uid in UID_PATTERN.findall(self.uids_input.text())))
+        if not uids:
+            QMessageBox.warning(self, "Ошибка", "Пожалуйста, укажите ID записей.")
+            logger.error("No ids entered for a batch operation")
+        return uids
+
+    def stage_update(self):
+        uids = self.selected_uids()
+        if not uids:
+            return
+
+        changes = {}
+        for header, (checkbox, line_edit) in self.field_inputs.items():
+            if not checkbox.isChecked():
+                continue
+            value = line_edit.text().strip()
+            if not value:
+                QMessageBox.warning(self, "Ошибка", f"Пожалуйста, заполните поле {header}.")
+                logger.error(f"The batch field {header} is empty")
+                return
+            changes[BATCH_FIELDS[header]] = value
+        if not changes:
+            QMessageBox.warning(self, "Ошибка", "Пожалуйста, отметьте поля для изменения.")
+            logger.error("No fields selected for a batch update")
+            return
+
+        summary = ", ".join(f"{header} = {changes[field]}" for header, field in BATCH_FIELDS.items() if field in changes)
+        self.add_operation(uids, changes, f"Изменить {len(uids)} записей: {summary}")
+
+    def stage_delete(self):
+        uids = self.selected_uids()
+        if uids:
+            self.add_operation(uids, None, f"Удалить {len(uids)} записей")
+
+    def add_operation(self, uids, changes, description):
+        self.operations.append((uids, changes))
+        self.operations_list.addItem(description)
+        logger.debug(f"Staged a batch operation on {len(uids)} records")
+
+    def remove_operation(self):
+        row = self.operations_list.currentRow()
+        if row < 0:
+            return
+        del self.operations[row]
+        self.operations_list.takeItem(row)
+
+    def resolve_values(self, cursor):
+        values = {table: set() for table in DICTIONARY_COLUMNS}
+        for _, changes in self.operations:
+            for table, value in (changes or {}).items():
+                if table in values:
+                    values[table].add(value)
+        return {
+            table: self.db.dictionaries.resolve_many(cursor, table, table_values)
+            for table, table_values in values.items() if table_values
+        }
+
+    @staticmethod
+    def assignments(changes, resolved):
+        columns = []
+        params = []
+        for field, value in changes.items():
+            if field in DICTIONARY_COLUMNS:
+                columns.append(DICTIONARY_COLUMNS[field])
+                params.append(resolved[field][value])
+            else:
+                columns.append(field)
+                params.append(value)
+        return ", ".join(f"{column} = %s" for column in columns), params
+
+    def apply_batch(self):
+        if not self.operations:
+            QMessageBox.warning(self, "Ошибка", "Пакет пуст.")
+            logger.error("An empty batch was applied")
+            return
+
+        confirm = QMessageBox.question(
+            self,
+            "Подтверждение",
+            f"Применить {len(self.operations)} операций одной транзакцией?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if confirm != QMessageBox.Yes:
+            return
+
+        updated = deleted = 0
+        changed = {}
+        try:
+            with self.db.transaction() as cursor:
+                resolved = self.resolve_values(cursor)
+                for uids, changes in self.operations:
+                    if changes is None:
+                        cursor.execute("DELETE FROM directory WHERE uid = ANY(%s) RETURNING uid;", (uids,))
+                        deleted += cursor.rowcount
+                    else:
+                        assignments, params = self.assignments(changes, resolved)
+                        cursor.execute(
+                            f"UPDATE directory SET {assignments} WHERE uid = ANY(%s) RETURNING uid;",
+                            params + [uids]
+                        )
+                        updated += cursor.rowcount
+                    changed.update(dict.fromkeys(uid for uid, in cursor.fetchall()))
+            self.changed_uids = list(changed)
+            QMessageBox.information(
+                self, "Успех", f"Пакет применён.\nИзменено записей: {updated}\nУдалено записей: {deleted}"
+            )
+            logger.debug(f"A batch of {len(self.operations)} operations was applied: {updated} updated, {deleted} deleted")
+            self.accept()
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось применить пакет:\n{e}")
+            logger.error(f"Error {e} while applying a batch")
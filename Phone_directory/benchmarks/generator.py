@@ -0,0 +1,175 @@
+import argparse
+import csv
+import io
+import itertools
+import logging
+import random
+import time
+
+
+logger = logging.getLogger(__name__)
+
+SCALES = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000,
+}
+BATCH_SIZE = 50_000
+
+SURNAME_ROOTS = [
+    'Иван', 'Смирн', 'Кузнец', 'Попов', 'Васил', 'Петр', 'Соколов', 'Михайл', 'Новик', 'Федор',
+    'Морозов', 'Волк', 'Алексе', 'Лебед', 'Семен', 'Егор', 'Павл', 'Козл', 'Степан', 'Никола',
+    'Орл', 'Андре', 'Макар', 'Никит', 'Захар', 'Зайц', 'Солов', 'Борис', 'Яковл', 'Григор',
+    'Роман', 'Воробь', 'Серге', 'Кузьмин', 'Фрол', 'Александр', 'Дмитри', 'Корол', 'Гусев', 'Киселев',
+    'Ильин', 'Максим', 'Поляк', 'Сорокин', 'Виноградов', 'Ковал', 'Белов', 'Медвед', 'Антон', 'Тарасов',
+]
+SURNAME_SUFFIXES = ['ов', 'ев', 'ин', 'ский', 'енко', 'ук', 'ич', 'ых', 'ко', 'ец']
+NAMES = [
+    'Александр', 'Сергей', 'Дмитрий', 'Андрей', 'Алексей', 'Максим', 'Евгений', 'Иван', 'Михаил', 'Артём',
+    'Николай', 'Владимир', 'Павел', 'Денис', 'Роман', 'Олег', 'Игорь', 'Юрий', 'Виктор', 'Кирилл',
+    'Елена', 'Ольга', 'Наталья', 'Татьяна', 'Ирина', 'Светлана', 'Анна', 'Мария', 'Екатерина', 'Юлия',
+    'Анастасия', 'Марина', 'Людмила', 'Галина', 'Надежда', 'Дарья', 'Ксения', 'Вера', 'Полина', 'Алина',
+]
+PATRONYMICS = [
+    'Александрович', 'Сергеевич', 'Дмитриевич', 'Андреевич', 'Алексеевич', 'Иванович', 'Михайлович',
+    'Николаевич', 'Владимирович', 'Павлович', 'Викторович', 'Юрьевич', 'Петрович', 'Олегович',
+    'Александровна', 'Сергеевна', 'Дмитриевна', 'Андреевна', 'Алексеевна', 'Ивановна', 'Михайловна',
+    'Николаевна', 'Владимировна', 'Павловна', 'Викторовна', 'Юрьевна', 'Петровна', 'Олеговна',
+]
+CITIES = [
+    'Москва', 'Санкт-Петербург', 'Новосибирск', 'Екатеринбург', 'Казань', 'Нижний Новгород', 'Челябинск',
+    'Самара', 'Омск', 'Ростов-на-Дону', 'Уфа', 'Красноярск', 'Воронеж', 'Пермь', 'Волгоград', 'Краснодар',
+    'Саратов', 'Тюмень', 'Тольятти', 'Ижевск', 'Барнаул', 'Ульяновск', 'Иркутск', 'Хабаровск', 'Ярославль',
+]
+STREET_ROOTS = [
+    'Ленина', 'Мира', 'Советская', 'Садовая', 'Школьная', 'Лесная', 'Молодёжная', 'Центральная', 'Новая',
+    'Набережная', 'Гагарина', 'Пушкина', 'Заречная', 'Зелёная', 'Полевая', 'Луговая', 'Октябрьская',
+    'Комсомольская', 'Первомайская', 'Строителей', 'Победы', 'Кирова', 'Чехова', 'Горького', 'Лермонтова',
+]
+STREET_KINDS = ['ул.', 'пр-т', 'пер.', 'б-р', 'ш.']
+PHONE_FORMATS = [
+    '+7 ({0}) {1}-{2}-{3}',
+    '8{0}{1}{2}{3}',
+    '+7{0}{1}{2}{3}',
+    '8 ({0}) {1}-{2}-{3}',
+    '{1}-{2}-{3}',
+]
+
+
+def zipf_weights(count, exponent=1.1):
+    return [1.0 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+class DirectoryGenerator:
+    def __init__(self, seed=42):
+        self.random = random.Random(seed)
+        self.surnames = [root + suffix for root in SURNAME_ROOTS for suffix in SURNAME_SUFFIXES]
+        self.random.shuffle(self.surnames)
+        self.streets = [f"{kind} {root}" for root in STREET_ROOTS for kind in STREET_KINDS]
+        self.surname_weights = list(itertools.accumulate(zipf_weights(len(self.surnames), 0.9)))
+        self.name_weights = list(itertools.accumulate(zipf_weights(len(NAMES), 0.8)))
+        self.patronymic_weights = list(itertools.accumulate(zipf_weights(len(PATRONYMICS), 0.8)))
+        self.city_weights = list(itertools.accumulate(zipf_weights(len(CITIES), 1.2)))
+        self.street_weights = list(itertools.accumulate(zipf_weights(len(self.streets), 0.7)))
+
+    def pick(self, values, cumulative_weights):
+        return self.random.choices(values, cum_weights=cumulative_weights)[0]
+
+    def telephone(self):
+        code = f"9{self.random.randint(0, 99):02d}"
+        number = self.random.randint(0, 9_999_999)
+        pattern = self.random.choice(PHONE_FORMATS)
+        return pattern.format(code, f"{number // 10000:03d}", f"{number // 100 % 100:02d}", f"{number % 100:02d}")
+
+    def record(self):
+        return (
+            self.pick(self.surnames, self.surname_weights),
+            self.pick(NAMES, self.name_weights),
+            self.pick(PATRONYMICS, self.patronymic_weights),
+            self.pick(CITIES, self.city_weights),
+            self.pick(self.streets, self.street_weights),
+            str(min(int(self.random.expovariate(1 / 25)) + 1, 300)),
+            self.telephone(),
+        )
+
+    def records(self, count):
+        for _ in range(count):
+            yield self.record()
+
+
+def reset_schema(db):
+    db.execute_query("TRUNCATE directory, surnames, names, patronymics, cities, streets RESTART IDENTITY CASCADE;")
+    db.dictionaries.clear()
+
+
+def populate(db, rows, seed=42, reset=False, report=None):
+    if reset:
+        reset_schema(db)
+    generator = DirectoryGenerator(seed)
+    started = time.monotonic()
+
+    with db.transaction() as cursor:
+        uids = {
+            table: db.dictionaries.resolve_many(cursor, table, values)
+            for table, values in (
+                ('surnames', generator.surnames),
+                ('names', NAMES),
+                ('patronymics', PATRONYMICS),
+                ('cities', CITIES),
+                ('streets', generator.streets),
+            )
+        }
+
+    loaded = 0
+    records = generator.records(rows)
+    while loaded < rows:
+        batch = list(itertools.islice(records, BATCH_SIZE))
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for surname, name, patronymic, city, street, house, telephone in batch:
+            writer.writerow([
+                uids['surnames'][surname], uids['names'][name], uids['patronymics'][patronymic],
+                uids['cities'][city], uids['streets'][street], house, telephone,
+            ])
+        buffer.seek(0)
+        with db.transaction() as cursor:
+            cursor.copy_expert(
+                "COPY directory (surname, name, patronymic, city, street, house, telephone) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+        loaded += len(batch)
+        if report:
+            report(loaded, rows)
+
+    db.execute_query("ANALYZE directory;")
+    elapsed = time.monotonic() - started
+    logger.info(f"Generated {loaded} rows in {elapsed:.1f} s ({loaded / elapsed:.0f} rows/s)")
+    return loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генерация синтетического справочника для бенчмарков")
+    parser.add_argument('--scale', choices=SCALES, default='10k', help="размер справочника")
+    parser.add_argument('--seed', type=int, default=42, help="зерно генератора")
+    parser.add_argument('--database', required=True, help="отдельная база данных для заполнения")
+    parser.add_argument('--reset', action='store_true', help="очистить справочник перед заполнением")
+    args = parser.parse_args()
+
+    import database
+    from instrumentation import configure_logging
+    from migrations import apply_migrations
+    configure_logging(logging.INFO)
+    database.DB_PARAMS['database'] = args.database
+    db = database.Database()
+    try:
+        apply_migrations(db)
+        populate(db, SCALES[args.scale], args.seed, args.reset,
+                 lambda loaded, total: logger.info(f"{loaded}/{total} rows"))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+SEARCH_TERMS = ['ова', 'Ленина', '916', 'Александр']
+COLUMN_FILTERS = [
+    {'Город': 'Москва', 'Фамилия': 'ов'},
+    {'Имя': 'Ан', 'Улица': 'Мира', 'Дом': '1'},
+    {'Отчество': 'вна', 'Телефон': '95'},
+]
+BENCHMARK_SURNAMES = 50
+BENCHMARK_VALUES = {
+    'names': ['Иван'],
+    'patronymics': ['Иванович'],
+    'cities': ['Москва'],
+    'streets': ['ул. Ленина'],
+}
+
+
+def measure(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'repeat': repeat,
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+class BenchmarkSuite:
+    def __init__(self, db, repeat=5):
+        self.db = db
+        self.repeat = repeat
+        self.results = {}
+
+    def run(self, name, function, repeat=None):
+        logger.info(f"Running {name}")
+        self.results[name] = measure(function, repeat or self.repeat)
+        logger.info(f"{name}: median {self.results[name]['median_ms']} ms")
+
+    def query_benchmarks(self):
+        from query_builder import PAGE_SIZE, build_filter_query
+
+        def fetch(*args, **kwargs):
+            query, params = build_filter_query(*args, **kwargs)
+            return lambda: self.db.fetch_all(query, params)
+
+        self.run('update_table.full_join', fetch(), repeat=max(1, self.repeat // 2))
+        self.run('update_table.first_page', fetch(sort_column=0, limit=PAGE_SIZE))
+        self.run('update_table.deep_page_city', fetch(
+            sort_column=4, after=('Ярославль', 0), limit=PAGE_SIZE
+        ))
+        self.run('update_table.deep_page_surname', fetch(
+            sort_column=1, after=('Я', 0), limit=PAGE_SIZE
+        ))
+        for term in SEARCH_TERMS:
+            self.run(f'search.{term}', fetch(term, sort_column=0, limit=PAGE_SIZE))
+        for index, filters in enumerate(COLUMN_FILTERS):
+            self.run(f'filters.{index}', fetch('', filters, sort_column=0, limit=PAGE_SIZE))
+
+    def insert_benchmarks(self):
+        from dictionary_resolver import DICTIONARY_COLUMNS
+        inserted = []
+        telephone = '+7 900 000-00-00'
+        counter = iter(range(10 ** 9))
+        values = dict(BENCHMARK_VALUES, surnames=[f'Бенчмарков{number}' for number in range(BENCHMARK_SURNAMES)])
+        existing = {
+            table: {value for value, in self.db.fetch_all(
+                f"SELECT value FROM {table} WHERE value = ANY(%s);", (table_values,), raise_errors=True
+            )}
+            for table, table_values in values.items()
+        }
+
+        def insert():
+            number = next(counter)
+            with self.db.transaction() as cursor:
+                uids = self.db.dictionaries.resolve(cursor, {
+                    table: table_values[number % len(table_values)] for table, table_values in values.items()
+                })
+                cursor.execute("""
+                    INSERT INTO directory (surname, name, patronymic, city, street, house, telephone)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING uid;
+                """, (
+                    uids['surnames'], uids['names'], uids['patronymics'], uids['cities'], uids['streets'],
+                    1, telephone,
+                ))
+                inserted.append(cursor.fetchone()[0])
+
+        try:
+            self.run('insert.utils_dialog', insert, repeat=self.repeat * 20)
+        finally:
+            self.db.execute_query("DELETE FROM directory WHERE uid = ANY(%s);", (inserted,))
+            for table, table_values in values.items():
+                created = [value for value in table_values if value not in existing[table]]
+                self.db.execute_query(f"""
+                    DELETE FROM {table} t WHERE t.value = ANY(%s)
+                    AND NOT EXISTS (SELECT 1 FROM directory d WHERE d.{DICTIONARY_COLUMNS[table]} = t.uid);
+                """, (created,))
+                self.db.dictionaries.invalidate(table)
+
+    def qt_benchmarks(self):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt5.QtWidgets import QApplication
+        from directory_model import DirectoryTableModel
+        from manage_parent_dialog import ManageParentDialog
+        from query_builder import PAGE_SIZE, build_filter_query
+
+        app = QApplication.instance() or QApplication([])
+        query, params = build_filter_query(sort_column=0, limit=PAGE_SIZE * 20)
+        rows = self.db.fetch_all(query, params)
+
+        def populate_model():
+            model = DirectoryTableModel(page_size=PAGE_SIZE)
+            model.set_rows(rows[:PAGE_SIZE])
+            for start in range(PAGE_SIZE, len(rows), PAGE_SIZE):
+                model.append_rows(rows[start:start + PAGE_SIZE])
+            for row in range(model.rowCount()):
+                for column in range(model.columnCount()):
+                    model.data(model.index(row, column))
+
+        self.run('model.populate_and_render', populate_model)
+        dialog = ManageParentDialog(self.db, 'surnames', 'Фамилии')
+        self.run('manage_parent_dialog.load_data', dialog.load_data)
+        dialog.deleteLater()
+        app.processEvents()
+
+    def run_all(self, skip_qt=False, skip_inserts=False):
+        self.query_benchmarks()
+        if not skip_inserts:
+            self.insert_benchmarks()
+        if not skip_qt:
+            self.qt_benchmarks()
+        return self.results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(db, scale):
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'scale': scale,
+        'rows': db.fetch_one("SELECT count(*) FROM directory;")[0],
+        'server_version': db.fetch_one("SHOW server_version;")[0],
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'revision': git_revision(),
+    }
+
+
+def compare(baseline_path, results):
+    with open(baseline_path, encoding='utf-8') as stream:
+        baseline = json.load(stream)['results']
+    print(f"{'benchmark':40} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for name, current in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['median_ms']
+        after = current['median_ms']
+        ratio = after / before if before else float('inf')
+        print(f"{name:40} {before:12.3f} {after:12.3f} {ratio:8.2f}")
+
+
+def main():
+    from benchmarks.generator import SCALES, populate
+    parser = argparse.ArgumentParser(description="Бенчмарки горячих путей телефонного справочника")
+    parser.add_argument('--scale', choices=SCALES, default='10k', help="размер справочника")
+    parser.add_argument('--database', help="база данных для бенчмарков (вместо DB_PARAMS)")
+    parser.add_argument('--populate', action='store_true', help="очистить и заново сгенерировать данные")
+    parser.add_argument('--seed', type=int, default=42, help="зерно генератора")
+    parser.add_argument('--repeat', type=int, default=5, help="число повторов каждого замера")
+    parser.add_argument('--skip-qt', action='store_true', help="не запускать замеры Qt")
+    parser.add_argument('--skip-inserts', action='store_true', help="не запускать замеры вставки")
+    parser.add_argument('--output', help="файл результатов JSON")
+    parser.add_argument('--compare', help="файл результатов для сравнения")
+    args = parser.parse_args()
+    if not args.database and (args.populate or not args.skip_inserts):
+        parser.error("--database обязателен для --populate и замеров вставки: они изменяют данные")
+
+    import database
+    from instrumentation import configure_logging
+    from migrations import apply_migrations
+    configure_logging(logging.INFO)
+    if args.database:
+        database.DB_PARAMS['database'] = args.database
+    db = database.Database()
+    try:
+        apply_migrations(db)
+        if args.populate:
+            populate(db, SCALES[args.scale], args.seed, reset=True)
+        results = BenchmarkSuite(db, args.repeat).run_all(args.skip_qt, args.skip_inserts)
+        report = {'meta': metadata(db, args.scale), 'results': results}
+    finally:
+        db.close()
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{args.scale}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, 'w', encoding='utf-8') as stream:
+        json.dump(report, stream, ensure_ascii=False, indent=2)
+    logger.info(f"Results written to {output}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+import argparse
+import csv
+import io
+import logging
+import os
+import re
+import sys
+import time
+
+from dictionary_resolver import DICTIONARY_COLUMNS
+
+
+logger = logging.getLogger(__name__)
+
+
+FIELDS = ('surname', 'name', 'patronymic', 'city', 'street', 'house', 'telephone')
+HEADERS = ('фамилия', 'имя', 'отчество', 'город', 'улица', 'дом', 'телефон')
+BATCH_SIZE = 10000
+NUMERIC_TYPES = ('smallint', 'integer', 'bigint', 'numeric')
+
+STAGING_QUERY = """
+    CREATE TEMP TABLE directory_import ON COMMIT DROP AS
+    SELECT surname, name, patronymic, city, street, house, telephone
+    FROM directory WITH NO DATA;
+"""
+
+COPY_QUERY = """
+    COPY directory_import (surname, name, patronymic, city, street, house, telephone)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+MERGE_QUERY = """
+    INSERT INTO directory (surname, name, patronymic, city, street, house, telephone)
+    SELECT i.surname, i.name, i.patronymic, i.city, i.street, i.house, i.telephone
+    FROM (
+        SELECT DISTINCT surname, name, patronymic, city, street, house, telephone FROM directory_import
+    ) i
+    WHERE NOT EXISTS (
+        SELECT 1 FROM directory d
+        WHERE d.surname = i.surname AND d.name = i.name AND d.patronymic = i.patronymic
+          AND d.city = i.city AND d.street = i.street AND d.house = i.house
+          AND d.telephone = i.telephone
+    );
+"""
+
+STREET_HOUSE = re.compile(r'^(.*?)[,\s]+(?:д\.?\s*)?(\d+\S*)$')
+
+
+class ByteCounter(io.RawIOBase):
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.raw.readinto(buffer)
+        self.bytes_read += count or 0
+        return count
+
+
+class ImportResult:
+    def __init__(self, imported, staged, skipped, elapsed):
+        self.imported = imported
+        self.staged = staged
+        self.skipped = skipped
+        self.elapsed = elapsed
+
+    @property
+    def rows_per_second(self):
+        return self.staged / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (
+            f"Импортировано {self.imported} записей из {self.staged} за {self.elapsed:.1f} с "
+            f"({self.rows_per_second:.0f} записей/с), пропущено некорректных: {self.skipped}"
+        )
+
+
+def read_csv(stream, delimiter=','):
+    reader = csv.reader(stream, delimiter=delimiter)
+    for line_number, row in enumerate(reader):
+        cells = tuple(cell.strip() for cell in row[:len(FIELDS)])
+        if line_number == 0 and tuple(cell.lower() for cell in cells) in (FIELDS, HEADERS):
+            continue
+        yield cells + ('',) * (len(FIELDS) - len(cells))
+
+
+def unfold(stream):
+    current = None
+    for line in stream:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def split_street(street):
+    match = STREET_HOUSE.match(street)
+    if match:
+        return match.group(1).strip(), match.group(2)
+    return street, ''
+
+
+def read_vcard(stream):
+    card = None
+    for line in unfold(stream):
+        key, _, value = line.partition(':')
+        key = key.split(';')[0].upper()
+        if key == 'BEGIN':
+            card = {}
+        elif card is None:
+            continue
+        elif key == 'N':
+            parts = value.split(';') + [''] * 3
+            card.setdefault('surname', parts[0].strip())
+            card.setdefault('name', parts[1].strip())
+            card.setdefault('patronymic', parts[2].strip())
+        elif key == 'ADR':
+            parts = value.split(';') + [''] * 7
+            street, house = split_street(parts[2].strip())
+            card.setdefault('street', street)
+            card.setdefault('house', house)
+            card.setdefault('city', parts[3].strip())
+        elif key == 'TEL':
+            card.setdefault('telephone', value.strip())
+        elif key == 'END':
+            yield tuple(card.get(field, '') for field in FIELDS)
+            card = None
+
+
+def detect_format(path):
+    return 'vcard' if os.path.splitext(path)[1].lower() in ('.vcf', '.vcard') else 'csv'
+
+
+class BulkImporter:
+    def __init__(self, db, batch_size=BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+
+    def house_is_numeric(self, cursor):
+        cursor.execute("""
+            SELECT data_type FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = 'directory' AND column_name = 'house';
+        """)
+        row = cursor.fetchone()
+        return row is not None and row[0] in NUMERIC_TYPES
+
+    def load_batch(self, cursor, batch):
+        resolved = [
+            self.db.dictionaries.resolve_many(cursor, table, [record[index] for record in batch])
+            for index, table in enumerate(DICTIONARY_COLUMNS)
+        ]
+        for index, (table, uids) in enumerate(zip(DICTIONARY_COLUMNS, resolved)):
+            missing = sorted({record[index] for record in batch}.difference(uids))
+            if missing:
+                raise ValueError(
+                    f"Значение «{missing[0]}» не найдено в таблице {table}"
+                    f"{f' (и ещё {len(missing) - 1})' if len(missing) > 1 else ''}: "
+                    f"возможно, оно было удалено во время импорта"
+                )
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for record in batch:
+            writer.writerow(
+                tuple(uids[value] for uids, value in zip(resolved, record)) + record[len(resolved):]
+            )
+        buffer.seek(0)
+        cursor.copy_expert(COPY_QUERY, buffer)
+
+    def run(self, path, file_format=None, delimiter=',', report=None):
+        file_format = file_format or detect_format(path)
+        total_bytes = os.path.getsize(path) or 1
+        started = time.monotonic()
+        staged = skipped = 0
+
+        with open(path, 'rb') as raw:
+            counter = ByteCounter(raw)
+            stream = io.TextIOWrapper(io.BufferedReader(counter), encoding='utf-8-sig', newline='')
+            if file_format == 'vcard':
+                records = read_vcard(stream)
+            else:
+                records = read_csv(stream, delimiter)
+
+            with self.db.transaction() as cursor:
+                cursor.execute(STAGING_QUERY)
+                numeric_house = self.house_is_numeric(cursor)
+                batch = []
+                for record in records:
+                    if not all(record) or (numeric_house and not record[5].isdigit()):
+                        skipped += 1
+                        continue
+                    batch.append(record)
+                    if len(batch) >= self.batch_size:
+                        self.load_batch(cursor, batch)
+                        staged += len(batch)
+                        batch = []
+                        if report:
+                            percent = min(99, counter.bytes_read * 100 // total_bytes)
+                            report(percent, f"Загружено {staged} записей")
+                if batch:
+                    self.load_batch(cursor, batch)
+                    staged += len(batch)
+                if report:
+                    report(99, f"Объединение {staged} записей со справочником")
+                cursor.execute(MERGE_QUERY)
+                imported = cursor.rowcount
+
+        return ImportResult(imported, staged, skipped, time.monotonic() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Массовый импорт контактов из CSV или vCard")
+    parser.add_argument('path', help="файл CSV или vCard")
+    parser.add_argument('--format', choices=('csv', 'vcard'), help="формат файла (по умолчанию по расширению)")
+    parser.add_argument('--delimiter', default=',', help="разделитель полей CSV")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="размер пакета")
+    args = parser.parse_args()
+
+    from database import Database
+    from instrumentation import configure_logging
+    configure_logging(logging.INFO)
+    db = Database()
+
+    def report(percent, message):
+        sys.stderr.write(f"\r[{percent:3d}%] {message}")
+        sys.stderr.flush()
+
+    try:
+        result = BulkImporter(db, args.batch_size).run(args.path, args.format, args.delimiter, report)
+        sys.stderr.write("\n")
+        print(result.summary())
+    except Exception as e:
+        sys.stderr.write("\n")
+        logger.error(f"Error {e} while importing {args.path}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import logging
+import psycopg2
+from PyQt5.QtCore import QObject, QSocketNotifier, QTimer, pyqtSignal
+
+
+logger = logging.getLogger(__name__)
+
+
+CHANGES_CHANNEL = 'directory_changes'
+RETRY_INTERVAL = 5000
+
+
+class ChangeListener(QObject):
+    changed = pyqtSignal(str, object)
+
+    def __init__(self, db, channel=CHANGES_CHANNEL, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.channel = channel
+        self.conn = None
+        self.notifier = None
+        self.retry_timer = QTimer(self)
+        self.retry_timer.setSingleShot(True)
+        self.retry_timer.setInterval(RETRY_INTERVAL)
+        self.retry_timer.timeout.connect(self.reconnect)
+
+    @property
+    def active(self):
+        return self.conn is not None and not self.conn.closed
+
+    def start(self):
+        try:
+            self.conn = self.db.listen(self.channel)
+        except psycopg2.Error as e:
+            logger.error(f"Error {e} while subscribing to {self.channel}")
+            self.conn = None
+            self.retry_timer.start()
+            return False
+        self.notifier = QSocketNotifier(self.conn.fileno(), QSocketNotifier.Read, self)
+        self.notifier.activated.connect(self.poll)
+        logger.debug(f"Listening for changes on {self.channel}")
+        return True
+
+    def reconnect(self):
+        if self.start():
+            self.changed.emit('directory', None)
+
+    def poll(self):
+        try:
+            self.conn.poll()
+        except psycopg2.Error as e:
+            logger.error(f"Error {e} while reading notifications")
+            self.stop()
+            self.retry_timer.start()
+            return
+        while self.conn.notifies:
+            notify = self.conn.notifies.pop(0)
+            table, _, payload = notify.payload.partition(':')
+            if payload == '*':
+                self.changed.emit(table, None)
+            else:
+                self.changed.emit(table, [int(uid) for uid in payload.split(',') if uid])
+
+    def stop(self):
+        if self.notifier is not None:
+            self.notifier.setEnabled(False)
+            self.notifier.deleteLater()
+            self.notifier = None
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
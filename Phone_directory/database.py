@@ -1,41 +1,186 @@
+import logging
 import psycopg2
+import psycopg2.errors
 import sys
+import threading
+import time
+from contextlib import contextmanager
+from psycopg2 import pool, sql
+from dictionary_resolver import DictionaryResolver
+from instrumentation import InstrumentedCursor
+
+
+logger = logging.getLogger(__name__)
+
+
+DB_PARAMS = {
+    'database': 'database_name',
+    'user': 'user_name',
+    'password': 'your_password',
+    'host': 'localhost',
+    'port': 'your_port',
+}
+
+POOL_MIN_SIZE = 1
+POOL_MAX_SIZE = 8
+HEALTH_CHECK_INTERVAL = 30.0
+RECONNECT_ATTEMPTS = 5
+RECONNECT_BACKOFF = 0.5
 
 
 class Database:
-    def __init__(self):
+    def __init__(self, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 health_check_interval=HEALTH_CHECK_INTERVAL,
+                 reconnect_attempts=RECONNECT_ATTEMPTS, reconnect_backoff=RECONNECT_BACKOFF, lazy=False):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self.reconnect_attempts = reconnect_attempts
+        self.reconnect_backoff = reconnect_backoff
+        self.last_used = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.dictionaries = DictionaryResolver()
+        self.pool = None
+        if not lazy:
+            try:
+                self.connect()
+            except psycopg2.Error as e:
+                logger.error(f"Error {e} while connecting to the database")
+                sys.exit(1)
+
+    def connect(self):
+        with self.lock:
+            if self.pool is None:
+                self.pool = pool.ThreadedConnectionPool(
+                    self.min_size, self.max_size, cursor_factory=InstrumentedCursor, **DB_PARAMS
+                )
+                logger.debug("Connected to the database")
+        return self.pool
+
+    @staticmethod
+    def create_connection(**options):
+        return psycopg2.connect(cursor_factory=InstrumentedCursor, **DB_PARAMS, **options)
+
+    def listen(self, channel):
+        conn = self.create_connection()
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("LISTEN {};").format(sql.Identifier(channel)))
+        return conn
+
+    def is_alive(self, conn):
+        if conn.closed:
+            return False
+        with self.lock:
+            idle = time.monotonic() - self.last_used.get(id(conn), 0.0)
+        if idle < self.health_check_interval:
+            return True
         try:
-            self.conn = psycopg2.connect(
-                database='database_name',
-                user='user_name',
-                password='your_password',
-                host='localhost',
-                port='your_port'
-            )
-            self.cursor = self.conn.cursor()
-            print("[DEBUG] Connected to the database")
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def checkout(self):
+        delay = self.reconnect_backoff
+        for attempt in range(1, self.reconnect_attempts + 1):
+            try:
+                conn = self.connect().getconn()
+            except (pool.PoolError, psycopg2.OperationalError) as e:
+                logger.error(f"Error {e} while getting a connection (attempt {attempt})")
+            else:
+                if self.is_alive(conn):
+                    return conn
+                logger.debug("Dropping a dead connection from the pool")
+                self.release(conn, discard=True)
+                continue
+            time.sleep(delay)
+            delay *= 2
+        raise psycopg2.OperationalError("Could not get a working database connection")
+
+    def release(self, conn, discard=False):
+        discard = discard or bool(conn.closed)
+        with self.lock:
+            if discard:
+                self.last_used.pop(id(conn), None)
+            else:
+                self.last_used[id(conn)] = time.monotonic()
+        self.pool.putconn(conn, close=discard)
+
+    @contextmanager
+    def connection(self):
+        conn = self.checkout()
+        try:
+            yield conn
+        finally:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    conn.close()
+            self.local.connection_lost = bool(conn.closed)
+            self.release(conn)
+
+    @contextmanager
+    def transaction(self):
+        with self.connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    yield cursor
+                conn.commit()
+            except BaseException as e:
+                if isinstance(e, psycopg2.errors.ForeignKeyViolation):
+                    logger.debug("Evicting cached dictionary uids after a foreign key violation")
+                    self.dictionaries.evict_used()
+                self.dictionaries.rollback()
+                raise
+            self.dictionaries.commit()
+
+    def run_with_reconnect(self, operation):
+        self.local.connection_lost = False
+        try:
+            return operation()
         except psycopg2.Error as e:
-            print(f"[ERROR] Error {e} while connecting to the database")
-            sys.exit(1)
+            if not getattr(self.local, 'connection_lost', False):
+                raise
+            logger.error(f"Error {e} on a dropped connection, retrying")
+            return operation()
 
     def execute_query(self, query, params=None):
+        def operation():
+            with self.transaction() as cursor:
+                cursor.execute(query, params)
         try:
-            self.cursor.execute(query, params)
-            self.conn.commit()
+            self.run_with_reconnect(operation)
         except psycopg2.Error as e:
-            self.conn.rollback()
-            print(f"[ERROR] Error {e} while request execution")
+            logger.error(f"Error {e} while request execution")
             raise e
 
-    def fetch_all(self, query, params=None):
+    def fetch_one(self, query, params=None):
+        def operation():
+            with self.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchone()
+        return self.run_with_reconnect(operation)
+
+    def fetch_all(self, query, params=None, raise_errors=False):
+        def operation():
+            with self.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchall()
         try:
-            self.cursor.execute(query, params)
-            return self.cursor.fetchall()
+            return self.run_with_reconnect(operation)
         except psycopg2.Error as e:
-            print(f"[ERROR] Error {e} while request execution")
+            logger.error(f"Error {e} while request execution")
+            if raise_errors:
+                raise
             return []
 
     def close(self):
-        self.cursor.close()
-        self.conn.close()
-        print("[DEBUG] Connection to the database is closed")
+        if self.pool is None:
+            return
+        self.pool.closeall()
+        logger.debug("Connection to the database is closed")
@@ -0,0 +1,341 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from difflib import SequenceMatcher
+from itertools import combinations, groupby
+
+from psycopg2.extras import execute_values
+
+from dictionary_resolver import DICTIONARY_COLUMNS
+from phone_numbers import normalize_phone
+from query_builder import BASE_QUERY
+
+
+logger = logging.getLogger(__name__)
+
+BLOCKING_KEYS = {
+    'surname_phone': "d.surname::text || ':' || right(d.telephone_digits, 7)",
+    'name_street': "d.name::text || ':' || d.street::text",
+    'full_name': "d.surname::text || ':' || d.name::text || ':' || d.patronymic::text",
+}
+FIELD_WEIGHTS = (3, 2, 1, 1, 2, 1, 3)
+TOTAL_WEIGHT = sum(FIELD_WEIGHTS)
+PHONE_FIELD = 6
+PHONE_SUFFIX_DIGITS = 7
+PHONE_SUFFIX_SCORE = 0.9
+STRICT_FIELDS = (1, 2)
+MIN_STRICT_SCORE = 0.85
+MIN_SCORE = 0.9
+MAX_BLOCK_SIZE = 200
+HOUSE_COLUMN = 6
+TELEPHONE_COLUMN = 7
+PHONE_SEPARATOR = ', '
+CHUNK_ROWS = 5000
+ITERSIZE = 20000
+
+
+def features(row):
+    return tuple(str(value).casefold() for value in row[1:7]) + (normalize_phone(row[7]),)
+
+
+def similarity(a, b, ratios):
+    ratio = ratios.get((a, b))
+    if ratio is None:
+        ratio = ratios[(a, b)] = SequenceMatcher(None, a, b, autojunk=False).ratio()
+    return ratio
+
+
+def score_pair(left, right, min_score=0.0, ratios=None):
+    ratios = {} if ratios is None else ratios
+    allowed_loss = TOTAL_WEIGHT * (1 - min_score)
+    loss = 0.0
+    candidates = []
+    for index, (weight, a, b) in enumerate(zip(FIELD_WEIGHTS, left, right)):
+        if a == b:
+            continue
+        if index == PHONE_FIELD and a[-PHONE_SUFFIX_DIGITS:] == b[-PHONE_SUFFIX_DIGITS:]:
+            loss += weight * (1 - PHONE_SUFFIX_SCORE)
+        else:
+            bound = 2 * min(len(a), len(b)) / (len(a) + len(b))
+            if index in STRICT_FIELDS and bound < MIN_STRICT_SCORE:
+                return None
+            loss += weight * (1 - bound)
+            candidates.append((weight, index, a, b, bound))
+        if loss > allowed_loss:
+            return None
+    candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+    for weight, index, a, b, bound in candidates:
+        ratio = similarity(a, b, ratios)
+        if index in STRICT_FIELDS and ratio < MIN_STRICT_SCORE:
+            return None
+        loss += weight * (bound - ratio)
+        if loss > allowed_loss:
+            return None
+    return 1 - loss / TOTAL_WEIGHT
+
+
+def score_blocks(blocks, min_score=MIN_SCORE):
+    pairs = []
+    ratios = {}
+    for rows in blocks:
+        prepared = [(row, features(row)) for row in rows]
+        for (left, left_features), (right, right_features) in combinations(prepared, 2):
+            score = score_pair(left_features, right_features, min_score, ratios)
+            if score is not None:
+                pairs.append((score, left, right))
+    return pairs
+
+
+class MergeProposal:
+    def __init__(self, keep, duplicates, score):
+        self.keep = keep
+        self.duplicates = duplicates
+        self.score = score
+
+    def duplicate_uids(self):
+        return [row[0] for row in self.duplicates]
+
+    def as_dict(self):
+        return {'keep': list(self.keep), 'duplicates': [list(row) for row in self.duplicates], 'score': self.score}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(tuple(data['keep']), [tuple(row) for row in data['duplicates']], data['score'])
+
+
+def build_proposals(pairs):
+    rows = {}
+    matches = {}
+    for score, left, right in pairs:
+        rows[left[0]] = left
+        rows[right[0]] = right
+        matches.setdefault(left[0], {})[right[0]] = score
+        matches.setdefault(right[0], {})[left[0]] = score
+
+    assigned = set()
+    proposals = []
+    for uid in sorted(rows, reverse=True):
+        if uid in assigned:
+            continue
+        duplicates = sorted(other for other in matches[uid] if other not in assigned)
+        if not duplicates:
+            continue
+        assigned.add(uid)
+        assigned.update(duplicates)
+        score = min(matches[uid][other] for other in duplicates)
+        proposals.append(MergeProposal(rows[uid], [rows[other] for other in duplicates], score))
+    proposals.sort(key=lambda proposal: (-proposal.score, proposal.keep[0]))
+    return proposals
+
+
+class DuplicateFinder:
+    def __init__(self, db, keys=tuple(BLOCKING_KEYS), workers=None, min_score=MIN_SCORE):
+        self.db = db
+        self.keys = keys
+        self.workers = workers or os.cpu_count() or 1
+        self.min_score = min_score
+        self.compared = 0
+
+    def log_oversized_blocks(self, key):
+        blocks, rows = self.db.fetch_one(f"""
+            SELECT count(*), coalesce(sum(block_size), 0) FROM (
+                SELECT count(*) AS block_size FROM directory d
+                GROUP BY {BLOCKING_KEYS[key]} HAVING count(*) > %s
+            ) oversized;
+        """, (MAX_BLOCK_SIZE,))
+        if blocks:
+            logger.warning(f"Skipped {blocks} blocks ({rows} rows) larger than {MAX_BLOCK_SIZE} for key {key}")
+
+    def candidate_query(self, key):
+        return f"""
+            SELECT k.block, r.*
+            FROM (
+                SELECT uid, block FROM (
+                    SELECT d.uid, {BLOCKING_KEYS[key]} AS block,
+                           count(*) OVER (PARTITION BY {BLOCKING_KEYS[key]}) AS block_size
+                    FROM directory d
+                ) counted
+                WHERE block_size BETWEEN 2 AND %s
+            ) k
+            JOIN ({BASE_QUERY}) r ON r.uid = k.uid
+            ORDER BY k.block, r.uid;
+        """
+
+    def stream_chunks(self, key):
+        with self.db.connection() as conn, conn.cursor(name=f"dedupe_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = ITERSIZE
+            cursor.execute(self.candidate_query(key), (MAX_BLOCK_SIZE,))
+            chunk = []
+            size = 0
+            for _, group in groupby(cursor, key=lambda row: row[0]):
+                rows = [row[1:] for row in group]
+                chunk.append(rows)
+                size += len(rows)
+                self.compared += len(rows) * (len(rows) - 1) // 2
+                if size >= CHUNK_ROWS:
+                    yield chunk
+                    chunk = []
+                    size = 0
+            if chunk:
+                yield chunk
+
+    def run(self, report=None):
+        started = time.monotonic()
+        pairs = {}
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as executor:
+            for step, key in enumerate(self.keys):
+                if report:
+                    report(step * 100 // len(self.keys), f"Поиск дубликатов по ключу {key}")
+                self.log_oversized_blocks(key)
+                pending = set()
+                for chunk in self.stream_chunks(key):
+                    pending.add(executor.submit(score_blocks, chunk, self.min_score))
+                    if len(pending) >= self.workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        self.collect(done, pairs)
+                    if report:
+                        report(step * 100 // len(self.keys), f"Поиск дубликатов по ключу {key}: {len(pairs)} пар")
+                self.collect(wait(pending).done, pairs)
+
+        proposals = build_proposals(pairs.values())
+        logger.info(
+            f"Compared {self.compared} candidate pairs, found {len(pairs)} duplicates "
+            f"in {len(proposals)} groups in {time.monotonic() - started:.1f} s"
+        )
+        return proposals
+
+    @staticmethod
+    def collect(futures, pairs):
+        for future in futures:
+            for score, left, right in future.result():
+                key = (left[0], right[0])
+                if key not in pairs or pairs[key][0] < score:
+                    pairs[key] = (score, left, right)
+
+
+UNCHANGED_ROWS = f"""
+    SELECT r.uid FROM ({BASE_QUERY}) r
+    JOIN (VALUES %s) AS p (uid, surname, name, patronymic, city, street, house, telephone)
+    ON (r.uid, r.surname, r.name, r.patronymic, r.city, r.street, r.house::text, r.telephone)
+     = (p.uid, p.surname, p.name, p.patronymic, p.city, p.street, p.house::text, p.telephone)
+"""
+
+
+def is_empty(value):
+    return value is None or str(value).strip() == ''
+
+
+def merge_rows(keep, duplicates):
+    merged = list(keep)
+    phones = [phone.strip() for phone in str(keep[TELEPHONE_COLUMN]).split(PHONE_SEPARATOR.strip())]
+    phones = [phone for phone in phones if phone]
+    seen = {normalize_phone(phone) for phone in phones}
+    for row in duplicates:
+        for index in range(1, TELEPHONE_COLUMN):
+            if is_empty(merged[index]) and not is_empty(row[index]):
+                merged[index] = row[index]
+        phone = str(row[TELEPHONE_COLUMN]).strip()
+        if phone and normalize_phone(phone) not in seen:
+            seen.add(normalize_phone(phone))
+            phones.append(phone)
+    merged[TELEPHONE_COLUMN] = PHONE_SEPARATOR.join(phones)
+    return tuple(merged)
+
+
+def update_merged(db, cursor, keep, merged):
+    tables = {
+        table: merged[index] for index, table in enumerate(DICTIONARY_COLUMNS, 1) if merged[index] != keep[index]
+    }
+    uids = db.dictionaries.resolve(cursor, tables) if tables else {}
+    assignments = [f"{DICTIONARY_COLUMNS[table]} = %s" for table in uids]
+    params = list(uids.values())
+    for index, column in ((HOUSE_COLUMN, 'house'), (TELEPHONE_COLUMN, 'telephone')):
+        if merged[index] != keep[index]:
+            assignments.append(f"{column} = %s")
+            params.append(merged[index])
+    cursor.execute(f"UPDATE directory SET {', '.join(assignments)} WHERE uid = %s;", params + [keep[0]])
+
+
+def apply_proposals(db, proposals):
+    merged_uids = []
+    with db.transaction() as cursor:
+        kept = execute_values(
+            cursor, f"SELECT uid FROM directory WHERE uid IN ({UNCHANGED_ROWS}) FOR UPDATE;",
+            [proposal.keep for proposal in proposals], fetch=True
+        )
+        kept = {uid for uid, in kept}
+        duplicates = [row for proposal in proposals if proposal.keep[0] in kept for row in proposal.duplicates]
+        deleted = []
+        if duplicates:
+            deleted = execute_values(
+                cursor, f"DELETE FROM directory WHERE uid IN ({UNCHANGED_ROWS}) RETURNING uid;", duplicates, fetch=True
+            )
+        deleted = {uid for uid, in deleted}
+        for proposal in proposals:
+            if proposal.keep[0] not in kept:
+                continue
+            merged = merge_rows(proposal.keep, [row for row in proposal.duplicates if row[0] in deleted])
+            if merged != tuple(proposal.keep):
+                update_merged(db, cursor, proposal.keep, merged)
+                merged_uids.append(proposal.keep[0])
+    skipped = sum(len(proposal.duplicates) for proposal in proposals) - len(deleted)
+    if skipped:
+        logger.warning(f"Skipped {skipped} duplicates that changed since they were found")
+    return sorted(deleted), merged_uids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Поиск и объединение дубликатов в справочнике")
+    parser.add_argument('--keys', nargs='+', choices=tuple(BLOCKING_KEYS), default=tuple(BLOCKING_KEYS),
+                        help="ключи блокировки")
+    parser.add_argument('--workers', type=int, help="число процессов (по умолчанию по числу ядер)")
+    parser.add_argument('--min-score', type=float, default=MIN_SCORE, help="минимальное сходство пары")
+    parser.add_argument('--output', help="файл JSON Lines для предложений объединения")
+    parser.add_argument('--proposals', help="применить предложения из файла JSON Lines вместо поиска")
+    parser.add_argument('--apply', action='store_true', help="объединить дубликаты из проверенного файла --proposals")
+    args = parser.parse_args()
+    if args.apply and not args.proposals:
+        parser.error("--apply требует --proposals: сохраните предложения через --output и проверьте их")
+
+    from database import Database
+    from instrumentation import configure_logging
+    configure_logging(logging.INFO)
+    db = Database()
+
+    def report(percent, message):
+        sys.stderr.write(f"\r[{percent:3d}%] {message}")
+        sys.stderr.flush()
+
+    try:
+        if args.proposals:
+            with open(args.proposals, encoding='utf-8') as stream:
+                proposals = [MergeProposal.from_dict(json.loads(line)) for line in stream if line.strip()]
+        else:
+            proposals = DuplicateFinder(db, args.keys, args.workers, args.min_score).run(report)
+            sys.stderr.write("\n")
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as stream:
+                for proposal in proposals:
+                    stream.write(json.dumps(proposal.as_dict(), ensure_ascii=False) + "\n")
+        print(f"Найдено групп дубликатов: {len(proposals)}, "
+              f"записей к удалению: {sum(len(proposal.duplicates) for proposal in proposals)}")
+        if args.apply:
+            deleted, merged = apply_proposals(db, proposals)
+            print(f"Удалено записей: {len(deleted)}, дополнено записей: {len(merged)}")
+    except Exception as e:
+        sys.stderr.write("\n")
+        logger.error(f"Error {e} while deduplicating the directory")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
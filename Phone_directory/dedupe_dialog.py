@@ -0,0 +1,107 @@
+import logging
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+    QPushButton, QMessageBox, QLabel, QHeaderView
+)
+from PyQt5.QtCore import Qt
+from dedupe import apply_proposals
+
+
+logger = logging.getLogger(__name__)
+
+
+def describe(row):
+    uid, surname, name, patronymic, city, street, house, telephone = row
+    return f"{uid}: {surname} {name} {patronymic}, {city}, {street} {house}, {telephone}"
+
+
+class DedupeDialog(QDialog):
+    def __init__(self, db, proposals):
+        super().__init__()
+        self.db = db
+        self.proposals = proposals
+        self.changed_uids = []
+        self.setWindowTitle("Дубликаты")
+        self.resize(1000, 500)
+
+        self.layout = QVBoxLayout()
+        self.setLayout(self.layout)
+
+        self.summary_label = QLabel(f"Найдено групп дубликатов: {len(proposals)}", self)
+        self.layout.addWidget(self.summary_label)
+
+        self.table = QTableWidget(self)
+        self.table.setColumnCount(3)
+        self.table.setHorizontalHeaderLabels(['Оставить', 'Удалить', 'Сходство'])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setWordWrap(True)
+        self.layout.addWidget(self.table)
+
+        self.table.setRowCount(len(proposals))
+        for row_idx, proposal in enumerate(proposals):
+            keep_item = QTableWidgetItem(describe(proposal.keep))
+            keep_item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable)
+            keep_item.setCheckState(Qt.Unchecked)
+            self.table.setItem(row_idx, 0, keep_item)
+            self.table.setItem(row_idx, 1, QTableWidgetItem("\n".join(map(describe, proposal.duplicates))))
+            self.table.setItem(row_idx, 2, QTableWidgetItem(f"{proposal.score:.2f}"))
+        self.table.resizeRowsToContents()
+
+        self.buttons_layout = QHBoxLayout()
+
+        self.select_all_button = QPushButton("Отметить все", self)
+        self.select_all_button.clicked.connect(lambda: self.set_checked(Qt.Checked))
+        self.buttons_layout.addWidget(self.select_all_button)
+
+        self.clear_button = QPushButton("Снять отметки", self)
+        self.clear_button.clicked.connect(lambda: self.set_checked(Qt.Unchecked))
+        self.buttons_layout.addWidget(self.clear_button)
+
+        self.apply_button = QPushButton("Объединить отмеченные", self)
+        self.apply_button.clicked.connect(self.apply_selected)
+        self.buttons_layout.addWidget(self.apply_button)
+
+        self.layout.addLayout(self.buttons_layout)
+
+    def set_checked(self, state):
+        for row_idx in range(self.table.rowCount()):
+            self.table.item(row_idx, 0).setCheckState(state)
+
+    def selected_proposals(self):
+        return [
+            proposal for row_idx, proposal in enumerate(self.proposals)
+            if self.table.item(row_idx, 0).checkState() == Qt.Checked
+        ]
+
+    def apply_selected(self):
+        proposals = self.selected_proposals()
+        if not proposals:
+            QMessageBox.warning(self, "Ошибка", "Пожалуйста, отметьте группы для объединения.")
+            logger.error("No duplicate groups selected")
+            return
+
+        count = sum(len(proposal.duplicates) for proposal in proposals)
+        confirm = QMessageBox.question(
+            self,
+            "Подтверждение",
+            f"Объединить {len(proposals)} групп? Телефоны и пустые поля будут перенесены в оставляемую запись, "
+            f"{count} дубликатов будут удалены.",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if confirm != QMessageBox.Yes:
+            return
+
+        try:
+            deleted, merged = apply_proposals(self.db, proposals)
+            self.changed_uids = deleted + merged
+            QMessageBox.information(
+                self, "Успех", f"Удалено дубликатов: {len(deleted)}\nДополнено записей: {len(merged)}"
+            )
+            logger.debug(f"Merged {len(proposals)} duplicate groups: {len(deleted)} deleted, {len(merged)} updated")
+            self.accept()
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось объединить дубликаты:\n{e}")
+            logger.error(f"Error {e} while merging duplicates")
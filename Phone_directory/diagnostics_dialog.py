@@ -0,0 +1,118 @@
+import json
+import logging
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton,
+    QHeaderView, QLabel, QSpinBox, QPlainTextEdit, QFileDialog, QMessageBox
+)
+from PyQt5.QtCore import Qt
+from instrumentation import STATS
+
+
+logger = logging.getLogger(__name__)
+
+
+class DiagnosticsDialog(QDialog):
+    COLUMNS = ['Запрос', 'Вызовов', 'Среднее, мс', 'p95, мс', 'Макс, мс', 'Строк', 'Ошибок']
+
+    def __init__(self, statements=None, parent=None):
+        super().__init__(parent)
+        self.statements = statements
+        self.setWindowTitle("Диагностика запросов")
+        self.resize(1100, 600)
+        self.queries = []
+
+        self.layout = QVBoxLayout()
+        self.setLayout(self.layout)
+
+        self.threshold_layout = QHBoxLayout()
+        self.threshold_layout.addWidget(QLabel("Порог медленного запроса, мс:"))
+        self.threshold_input = QSpinBox(self)
+        self.threshold_input.setRange(1, 600000)
+        self.threshold_input.setValue(int(STATS.slow_threshold_ms))
+        self.threshold_input.valueChanged.connect(self.set_threshold)
+        self.threshold_layout.addWidget(self.threshold_input)
+        self.threshold_layout.addStretch()
+        self.statements_label = QLabel(self)
+        self.threshold_layout.addWidget(self.statements_label)
+        self.layout.addLayout(self.threshold_layout)
+
+        self.table = QTableWidget(self)
+        self.table.setColumnCount(len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.itemSelectionChanged.connect(self.show_details)
+        self.layout.addWidget(self.table)
+
+        self.details = QPlainTextEdit(self)
+        self.details.setReadOnly(True)
+        self.layout.addWidget(self.details)
+
+        self.buttons_layout = QHBoxLayout()
+
+        self.refresh_button = QPushButton("Обновить", self)
+        self.refresh_button.clicked.connect(self.load_data)
+        self.buttons_layout.addWidget(self.refresh_button)
+
+        self.reset_button = QPushButton("Сбросить", self)
+        self.reset_button.clicked.connect(self.reset_stats)
+        self.buttons_layout.addWidget(self.reset_button)
+
+        self.save_button = QPushButton("Сохранить JSON", self)
+        self.save_button.clicked.connect(self.save_stats)
+        self.buttons_layout.addWidget(self.save_button)
+
+        self.layout.addLayout(self.buttons_layout)
+
+        self.load_data()
+
+    def load_data(self):
+        self.queries = STATS.snapshot()
+        self.table.setRowCount(len(self.queries))
+        for row_idx, query in enumerate(self.queries):
+            values = [
+                query['fingerprint'], query['calls'], query['mean_ms'], query['p95_ms'],
+                query['max_ms'], query['rows'], query['errors'],
+            ]
+            for col_idx, value in enumerate(values):
+                item = QTableWidgetItem(str(value))
+                item.setFlags(item.flags() ^ Qt.ItemIsEditable)
+                self.table.setItem(row_idx, col_idx, item)
+        self.details.clear()
+        if self.statements is not None:
+            prepared = self.statements.snapshot()
+            self.statements_label.setText(
+                f"Подготовленные запросы: форм {prepared['shapes']}, "
+                f"попаданий {prepared['hits']}, промахов {prepared['misses']}"
+            )
+
+    def show_details(self):
+        rows = self.table.selectionModel().selectedRows()
+        if not rows:
+            return
+        query = self.queries[rows[0].row()]
+        self.details.setPlainText(
+            f"{query['fingerprint']}\n\n"
+            f"Параметры: {query['params_shape']}\n"
+            f"Гистограмма: {json.dumps(query['histogram_ms'])}\n\n"
+            f"{query['explain'] or 'План не сохранён'}"
+        )
+
+    def set_threshold(self, value):
+        STATS.slow_threshold_ms = float(value)
+
+    def reset_stats(self):
+        STATS.reset()
+        self.load_data()
+
+    def save_stats(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Сохранить статистику", "query_stats.json", "JSON (*.json)")
+        if not path:
+            return
+        try:
+            STATS.dump(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить статистику:\n{e}")
+            logger.error("Failed to save query statistics")
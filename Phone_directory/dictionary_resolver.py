@@ -0,0 +1,153 @@
+import threading
+from collections import OrderedDict, deque
+
+from psycopg2 import sql
+
+
+DICTIONARY_COLUMNS = {
+    'surnames': 'surname',
+    'names': 'name',
+    'patronymics': 'patronymic',
+    'cities': 'city',
+    'streets': 'street',
+}
+CACHE_SIZE = 10000
+
+
+class DictionaryResolver:
+    def __init__(self, max_size=CACHE_SIZE):
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    def pending(self):
+        if not hasattr(self.local, 'pending'):
+            self.local.pending = deque(maxlen=self.max_size)
+        return self.local.pending
+
+    def used(self):
+        if not hasattr(self.local, 'used'):
+            self.local.used = set()
+        return self.local.used
+
+    def cached(self, table, value):
+        with self.lock:
+            uid = self.cache.get((table, value))
+            if uid is None:
+                self.misses += 1
+                return None
+            self.cache.move_to_end((table, value))
+            self.hits += 1
+        self.used().add((table, value))
+        return uid
+
+    def remember(self, table, value, uid):
+        with self.lock:
+            self.cache[(table, value)] = uid
+            self.cache.move_to_end((table, value))
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+
+    def build_upsert(self, values):
+        ctes = []
+        columns = []
+        params = []
+        for table, value in values.items():
+            ctes.append(sql.SQL(
+                "{new} AS (INSERT INTO {table} (value) VALUES (%s) ON CONFLICT (value) DO NOTHING RETURNING uid)"
+            ).format(new=sql.Identifier(f"{table}_new"), table=sql.Identifier(table)))
+            params.append(value)
+        for table, value in values.items():
+            columns.append(sql.SQL(
+                "COALESCE((SELECT uid FROM {new}), (SELECT uid FROM {table} WHERE value = %s))"
+            ).format(new=sql.Identifier(f"{table}_new"), table=sql.Identifier(table)))
+            params.append(value)
+        query = sql.SQL("WITH {ctes} SELECT {columns};").format(
+            ctes=sql.SQL(", ").join(ctes),
+            columns=sql.SQL(", ").join(columns),
+        )
+        return query, params
+
+    def resolve(self, cursor, values):
+        result = {}
+        missing = {}
+        for table, value in values.items():
+            uid = self.cached(table, value)
+            if uid is None:
+                missing[table] = value
+            else:
+                result[table] = uid
+
+        while missing:
+            query, params = self.build_upsert(missing)
+            cursor.execute(query, params)
+            unresolved = {}
+            for (table, value), uid in zip(missing.items(), cursor.fetchone()):
+                if uid is None:
+                    unresolved[table] = value
+                    continue
+                result[table] = uid
+                self.pending().append((table, value, uid))
+            missing = unresolved
+        return result
+
+    def resolve_many(self, cursor, table, values):
+        result = {}
+        missing = []
+        for value in set(values):
+            uid = self.cached(table, value)
+            if uid is None:
+                missing.append(value)
+            else:
+                result[value] = uid
+
+        if missing:
+            cursor.execute(sql.SQL(
+                "INSERT INTO {table} (value) SELECT unnest(%s::text[]) ON CONFLICT (value) DO NOTHING;"
+            ).format(table=sql.Identifier(table)), (missing,))
+            cursor.execute(sql.SQL(
+                "SELECT value, uid FROM {table} WHERE value = ANY(%s::text[]);"
+            ).format(table=sql.Identifier(table)), (missing,))
+            for value, uid in cursor.fetchall():
+                result[value] = uid
+                self.pending().append((table, value, uid))
+        return result
+
+    def commit(self):
+        for table, value, uid in self.pending():
+            self.remember(table, value, uid)
+        self.pending().clear()
+        self.used().clear()
+
+    def rollback(self):
+        self.pending().clear()
+        self.used().clear()
+
+    def evict_used(self):
+        with self.lock:
+            for key in self.used():
+                self.cache.pop(key, None)
+        self.used().clear()
+
+    def invalidate(self, table, uid=None):
+        with self.lock:
+            stale = [
+                key for key, cached_uid in self.cache.items()
+                if key[0] == table and (uid is None or cached_uid == uid)
+            ]
+            for key in stale:
+                del self.cache[key]
+
+    def invalidate_uids(self, table, uids):
+        uids = set(uids)
+        with self.lock:
+            stale = [key for key, cached_uid in self.cache.items() if key[0] == table and cached_uid in uids]
+            for key in stale:
+                del self.cache[key]
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
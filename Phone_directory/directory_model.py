@@ -0,0 +1,135 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+from row_store import RowStore
+
+
+class DirectoryTableModel(QAbstractTableModel):
+    HEADERS = ['ID', 'Фамилия', 'Имя', 'Отчество', 'Город', 'Улица', 'Дом', 'Телефон']
+
+    more_requested = pyqtSignal()
+    sort_requested = pyqtSignal()
+
+    def __init__(self, page_size=500, parent=None):
+        super().__init__(parent)
+        self.page_size = page_size
+        self.rows = RowStore()
+        self.exhausted = True
+        self.loading = False
+        self.sort_column = 0
+        self.descending = False
+
+    def set_rows(self, rows, exhausted=None):
+        self.beginResetModel()
+        self.rows = RowStore(rows)
+        self.exhausted = len(self.rows) < self.page_size if exhausted is None else exhausted
+        self.loading = False
+        self.endResetModel()
+
+    def append_rows(self, rows):
+        self.loading = False
+        self.exhausted = len(rows) < self.page_size
+        if not rows:
+            return
+        first = len(self.rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self.rows.extend(rows)
+        self.endInsertRows()
+
+    def begin_loading(self):
+        self.loading = True
+
+    def cancel_loading(self):
+        self.loading = False
+
+    def last_key(self):
+        if not self.rows:
+            return None
+        row = self.rows[-1]
+        return row[self.sort_column], row[0]
+
+    def loaded_uids(self):
+        return self.rows.uids()
+
+    def sort_key(self, row):
+        return row[self.sort_column], row[0]
+
+    def insert_position(self, key, keys):
+        low, high = 0, len(keys)
+        while low < high:
+            middle = (low + high) // 2
+            if (keys[middle] < key) if self.descending else (keys[middle] > key):
+                high = middle
+            else:
+                low = middle + 1
+        if low == len(keys) and not self.exhausted:
+            return None
+        return low
+
+    def apply_changes(self, uids, rows):
+        changed = {row[0]: row for row in rows}
+        stale = set(uids)
+        loaded = self.rows.uids()
+        for position in reversed(range(len(loaded))):
+            uid = loaded[position]
+            if uid not in stale:
+                continue
+            row = changed.pop(uid, None)
+            if row is not None and self.sort_key(row) == self.sort_key(self.rows[position]):
+                self.rows[position] = row
+                self.dataChanged.emit(self.index(position, 0), self.index(position, len(self.HEADERS) - 1))
+                continue
+            self.beginRemoveRows(QModelIndex(), position, position)
+            del self.rows[position]
+            self.endRemoveRows()
+            if row is not None:
+                changed[uid] = row
+        if not changed:
+            return
+        keys = list(zip(self.rows.column(self.sort_column), self.rows.uids()))
+        for row in changed.values():
+            key = self.sort_key(row)
+            position = self.insert_position(key, keys)
+            if position is None:
+                continue
+            self.beginInsertRows(QModelIndex(), position, position)
+            self.rows.insert(position, row)
+            keys.insert(position, key)
+            self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        return str(self.rows.value(index.row(), index.column()))
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return section + 1
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted and not self.loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self.loading = True
+        self.more_requested.emit()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        descending = order == Qt.DescendingOrder
+        if (column, descending) == (self.sort_column, self.descending):
+            return
+        self.sort_column = column
+        self.descending = descending
+        self.sort_requested.emit()
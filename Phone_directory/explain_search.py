@@ -0,0 +1,60 @@
+import argparse
+import re
+
+from database import Database
+from query_builder import BASE_QUERY, build_filter_query, like_pattern
+
+
+LEGACY_SEARCH_CONDITION = """
+    WHERE (s.value ILIKE %s
+    OR n.value ILIKE %s
+    OR p.value ILIKE %s
+    OR c.value ILIKE %s
+    OR st.value ILIKE %s
+    OR d.house::text ILIKE %s
+    OR d.telephone ILIKE %s)
+"""
+
+
+def build_legacy_search_query(search_term):
+    return BASE_QUERY + LEGACY_SEARCH_CONDITION, [like_pattern(search_term)] * 7
+
+
+def explain(db, query, params):
+    rows = db.fetch_all("EXPLAIN (ANALYZE, BUFFERS) " + query, params)
+    return [row[0] for row in rows]
+
+
+def execution_time(plan):
+    for line in reversed(plan):
+        match = re.match(r"Execution Time: ([\d.]+) ms", line.strip())
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение планов общего поиска до и после индексов pg_trgm")
+    parser.add_argument('term', help="строка поиска")
+    args = parser.parse_args()
+
+    db = Database()
+    try:
+        timings = {}
+        for label, (query, params) in (
+            ('legacy ILIKE OR', build_legacy_search_query(args.term)),
+            ('indexed UNION', build_filter_query(args.term)),
+        ):
+            plan = explain(db, query, params)
+            timings[label] = execution_time(plan)
+            print(f"===== {label} =====")
+            print("\n".join(plan))
+            print()
+        for label, timing in timings.items():
+            print(f"{label}: {timing} ms")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import uuid
+
+from query_builder import build_filter_query
+
+
+logger = logging.getLogger(__name__)
+
+
+COLUMNS = ('uid', 'surname', 'name', 'patronymic', 'city', 'street', 'house', 'telephone')
+ITERSIZE = 2000
+FORMATS = ('csv', 'jsonl')
+
+
+class CsvWriter:
+    def __init__(self, stream):
+        self.writer = csv.writer(stream)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+
+class JsonLinesWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, row):
+        self.stream.write(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False, default=str))
+        self.stream.write('\n')
+
+
+WRITERS = {'csv': CsvWriter, 'jsonl': JsonLinesWriter}
+
+
+def estimate_rows(db, query, params):
+    row = db.fetch_one(f"EXPLAIN (FORMAT JSON) {query}", params)
+    return int(row[0][0]['Plan']['Plan Rows']) if row else 0
+
+
+def export_rows(db, path, file_format='csv', search_term='', filters=None, itersize=ITERSIZE, report=None):
+    query, params = build_filter_query(search_term, filters)
+    total = estimate_rows(db, query, params) if report else 0
+    exported = 0
+    directory, name = os.path.split(os.path.abspath(path))
+    temporary = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+
+    try:
+        with open(temporary, 'w', encoding='utf-8', newline='') as stream, db.connection() as conn:
+            writer = WRITERS[file_format](stream)
+            with conn.cursor(name=f"export_{uuid.uuid4().hex}") as cursor:
+                cursor.itersize = itersize
+                cursor.execute(query, params)
+                for row in cursor:
+                    writer.write(row)
+                    exported += 1
+                    if report and exported % itersize == 0:
+                        percent = min(exported * 100 // max(total, 1), 99)
+                        report(percent, f"Выгружено {exported} из ~{max(total, exported)} записей")
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Потоковая выгрузка справочника в CSV или JSON Lines")
+    parser.add_argument('path', help="файл для выгрузки")
+    parser.add_argument('--format', choices=FORMATS, default='csv', help="формат файла")
+    parser.add_argument('--search', default='', help="строка общего поиска")
+    parser.add_argument('--itersize', type=int, default=ITERSIZE, help="размер порции курсора")
+    args = parser.parse_args()
+
+    from database import Database
+    from instrumentation import configure_logging
+    configure_logging(logging.INFO)
+    db = Database()
+    try:
+        exported = export_rows(db, args.path, args.format, args.search, itersize=args.itersize)
+        logger.info(f"Exported {exported} rows to {args.path}")
+    except Exception as e:
+        logger.error(f"Error {e} while exporting to {args.path}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
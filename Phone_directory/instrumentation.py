@@ -0,0 +1,193 @@
+import json
+import logging
+import re
+import threading
+import time
+
+import psycopg2.extensions
+from psycopg2 import sql
+
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_THRESHOLD_MS = 500.0
+HISTOGRAM_BOUNDS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+EXPLAINABLE = re.compile(r'^\s*SELECT\b', re.IGNORECASE)
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|\$\d+')
+WHITESPACE = re.compile(r'\s+')
+IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+
+
+def fingerprint(query):
+    text = STRING_LITERAL.sub('?', query)
+    text = PLACEHOLDER.sub('?', text)
+    text = NUMBER_LITERAL.sub('?', text)
+    text = IN_LIST.sub('(?...)', text)
+    return WHITESPACE.sub(' ', text).strip().rstrip(';')
+
+
+def params_shape(params):
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+class QueryFingerprintStats:
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.params_shape = None
+        self.explain = None
+
+    def record(self, elapsed_ms, rowcount, shape, failed):
+        self.calls += 1
+        self.errors += int(failed)
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += max(rowcount, 0)
+        self.params_shape = shape
+        for bucket, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if elapsed_ms <= bound:
+                self.histogram[bucket] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    def percentile(self, fraction):
+        threshold = self.calls * fraction
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if seen >= threshold and count:
+                return HISTOGRAM_BOUNDS_MS[bucket] if bucket < len(HISTOGRAM_BOUNDS_MS) else self.max_ms
+        return 0.0
+
+    def as_dict(self):
+        return {
+            'fingerprint': self.fingerprint,
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            'p95_ms': self.percentile(0.95),
+            'max_ms': round(self.max_ms, 3),
+            'rows': self.rows,
+            'params_shape': self.params_shape,
+            'histogram_ms': dict(zip([f"<={bound}" for bound in HISTOGRAM_BOUNDS_MS] + ['>'], self.histogram)),
+            'explain': self.explain,
+        }
+
+
+class QueryStats:
+    def __init__(self, slow_threshold_ms=SLOW_QUERY_THRESHOLD_MS):
+        self.slow_threshold_ms = slow_threshold_ms
+        self.capture_explain = True
+        self.lock = threading.Lock()
+        self.queries = {}
+
+    def record(self, query, params, elapsed_ms, rowcount, failed):
+        key = fingerprint(query)
+        shape = params_shape(params)
+        with self.lock:
+            stats = self.queries.get(key)
+            if stats is None:
+                stats = self.queries[key] = QueryFingerprintStats(key)
+            stats.record(elapsed_ms, rowcount, shape, failed)
+            needs_explain = (
+                not failed and self.capture_explain and stats.explain is None
+                and elapsed_ms >= self.slow_threshold_ms and EXPLAINABLE.match(query) is not None
+            )
+            if needs_explain:
+                stats.explain = ""
+        if elapsed_ms >= self.slow_threshold_ms:
+            logger.warning("Slow query (%.1f ms, %s rows, params %s): %s", elapsed_ms, rowcount, shape, key)
+        else:
+            logger.debug("Query (%.1f ms, %s rows): %s", elapsed_ms, rowcount, key)
+        return stats if needs_explain else None
+
+    def snapshot(self):
+        with self.lock:
+            return sorted((stats.as_dict() for stats in self.queries.values()),
+                          key=lambda item: item['total_ms'], reverse=True)
+
+    def reset(self):
+        with self.lock:
+            self.queries.clear()
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as stream:
+            json.dump({
+                'slow_threshold_ms': self.slow_threshold_ms,
+                'queries': self.snapshot(),
+            }, stream, ensure_ascii=False, indent=2)
+        logger.info("Query statistics written to %s", path)
+
+
+STATS = QueryStats()
+
+
+def configure_logging(level=logging.DEBUG):
+    logging.basicConfig(level=level, format="[%(levelname)s] %(name)s: %(message)s")
+    logger.setLevel(max(level, logging.INFO))
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    def query_text(self, query):
+        if isinstance(query, sql.Composable):
+            return query.as_string(self.connection)
+        if isinstance(query, bytes):
+            return query.decode('utf-8', 'replace')
+        return query
+
+    def timed(self, operation, query, params, *args, statement=None):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = operation(*args)
+            failed = False
+            return result
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            text = self.query_text(query)
+            stats = STATS.record(statement or text, params, elapsed_ms, self.rowcount, failed)
+            if stats is not None:
+                self.capture_explain(stats, text, params)
+
+    def capture_explain(self, stats, query, params):
+        savepoint = not self.connection.autocommit
+        try:
+            with psycopg2.extensions.cursor(self.connection) as cursor:
+                if savepoint:
+                    cursor.execute("SAVEPOINT capture_explain;")
+                try:
+                    cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, params)
+                    stats.explain = "\n".join(row[0] for row in cursor.fetchall())
+                finally:
+                    if savepoint:
+                        cursor.execute("ROLLBACK TO SAVEPOINT capture_explain;")
+            logger.warning("Captured plan for slow query %s:\n%s", stats.fingerprint, stats.explain)
+        except psycopg2.Error as e:
+            stats.explain = f"EXPLAIN failed: {e}"
+            logger.error("Error %s while capturing a query plan", e)
+
+    def execute(self, query, params=None):
+        return self.timed(super().execute, query, params, query, params)
+
+    def execute_prepared(self, statement, query, params=None):
+        return self.timed(super().execute, query, params, query, params, statement=statement)
+
+    def executemany(self, query, params_list):
+        return self.timed(super().executemany, query, None, query, params_list)
+
+    def copy_expert(self, query, file, size=8192):
+        return self.timed(super().copy_expert, query, None, query, file, size)
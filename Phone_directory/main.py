@@ -1,14 +1,49 @@
+import time
+
+STARTED = time.perf_counter()
+
+import logging
 import sys
 from PyQt5.QtWidgets import QApplication
 from database import Database
+from instrumentation import configure_logging
 from main_window import MainWindow
 
 
+logger = logging.getLogger(__name__)
+
+MEASURE_STARTUP_FLAG = '--measure-startup'
+
+
+def prepare_database(db):
+    from migrations import apply_migrations
+    db.connect()
+    try:
+        apply_migrations(db)
+    except Exception as e:
+        logger.error(f"Error {e} while applying migrations")
+
+
+def measure_startup(app, main_win, started):
+    def report(stage):
+        logger.info(f"Startup: {stage} after {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    app.processEvents()
+    report("window shown")
+    main_win.first_page_loaded.connect(lambda: (report("first page loaded"), app.quit()))
+
+
 def main():
+    measure = MEASURE_STARTUP_FLAG in sys.argv
+    configure_logging(logging.INFO if measure else logging.DEBUG)
     app = QApplication(sys.argv)
-    db = Database()
+    db = Database(lazy=True)
     main_win = MainWindow(db)
     main_win.show()
+    app.aboutToQuit.connect(main_win.close)
+    if measure:
+        measure_startup(app, main_win, STARTED)
+    main_win.start(lambda: prepare_database(db))
     exit_code = app.exec_()
     db.close()
     sys.exit(exit_code)
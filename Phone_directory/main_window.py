@@ -1,13 +1,39 @@
-from PyQt5.QtCore import Qt, QTimer
+import logging
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 from PyQt5.QtWidgets import (
-    QWidget, QTableWidget, QTableWidgetItem, QPushButton, QVBoxLayout, QDialog,
-    QLineEdit, QHeaderView, QHBoxLayout, QLabel, QGroupBox, QGridLayout, QSizePolicy, QMessageBox,
+    QWidget, QTableView, QPushButton, QVBoxLayout, QDialog,
+    QLineEdit, QHeaderView, QAbstractItemView, QHBoxLayout, QLabel, QGroupBox, QGridLayout, QSizePolicy, QMessageBox,
+    QFileDialog, QProgressDialog, QCheckBox,
 )
+from background_task import BackgroundTask
+from batch_edit_dialog import BatchEditDialog
+from bulk_import import BulkImporter
+from change_listener import ChangeListener
+from dedupe import DuplicateFinder
+from dedupe_dialog import DedupeDialog
+from diagnostics_dialog import DiagnosticsDialog
+from dictionary_resolver import DICTIONARY_COLUMNS
+from exporter import export_rows
+from directory_model import DirectoryTableModel
 from manage_parent_dialog import ManageParentDialog
+from memory_index import MemoryDirectory
+from query_builder import PAGE_SIZE, build_filter_query
+from query_executor import QueryExecutor
+from replica import LocalReplica
+from result_cache import ResultCache
+from snapshot import read_snapshot, write_snapshot
 from utils_dialog import UtilsDialog
+from value_completer import DictionaryCompletions
+
+
+logger = logging.getLogger(__name__)
+
+REPLICA_SYNC_INTERVAL = 60000
 
 
 class MainWindow(QWidget):
+    first_page_loaded = pyqtSignal()
+
     def __init__(self, db):
         super().__init__()
         self.db = db
@@ -28,6 +54,12 @@ class MainWindow(QWidget):
         self.search_input.textChanged.connect(self.search)
         search_layout.addWidget(QLabel("Поиск:"))
         search_layout.addWidget(self.search_input)
+        self.memory_checkbox = QCheckBox("Локальный поиск", self)
+        self.memory_checkbox.toggled.connect(self.toggle_memory_index)
+        search_layout.addWidget(self.memory_checkbox)
+        self.replica_checkbox = QCheckBox("Локальная копия", self)
+        self.replica_checkbox.toggled.connect(self.toggle_replica)
+        search_layout.addWidget(self.replica_checkbox)
         self.top_layout.addWidget(search_group)
 
         manage_group = QGroupBox("Управление таблицами")
@@ -46,6 +78,14 @@ class MainWindow(QWidget):
         self.manage_patronymics_button.clicked.connect(lambda: self.show_manage_dialog('patronymics', 'Отчества'))
         manage_layout.addWidget(self.manage_patronymics_button)
 
+        self.manage_cities_button = QPushButton("Города")
+        self.manage_cities_button.clicked.connect(lambda: self.show_manage_dialog('cities', 'Города'))
+        manage_layout.addWidget(self.manage_cities_button)
+
+        self.manage_streets_button = QPushButton("Улицы")
+        self.manage_streets_button.clicked.connect(lambda: self.show_manage_dialog('streets', 'Улицы'))
+        manage_layout.addWidget(self.manage_streets_button)
+
         self.top_layout.addWidget(manage_group)
 
         self.top_layout.addStretch()
@@ -65,56 +105,313 @@ class MainWindow(QWidget):
             filters_layout.addWidget(line_edit, 1, col)
         self.layout.addWidget(filters_group)
 
-        self.table = QTableWidget(self)
-        self.table.setColumnCount(8)
-        self.table.setHorizontalHeaderLabels([
-            'ID', 'Фамилия', 'Имя', 'Отчество',
-            'Город', 'Улица', 'Дом', 'Телефон'
-        ])
+        self.executor = QueryExecutor(self.db.create_connection, parent=self)
+        self.executor.finished.connect(self.on_query_finished)
+        self.executor.failed.connect(self.on_query_failed)
+
+        self.active_filters = ('', {})
+        self.append_generation = None
+        self.memory_index = None
+        self.local_rows = []
+        self.replica = None
+        self.replica_task = None
+        self.replica_pending = False
+        self.change_task = None
+        self.pending_changes = []
+        self.result_cache = ResultCache()
+        self.completions = DictionaryCompletions()
+        self.model = DirectoryTableModel(page_size=PAGE_SIZE, parent=self)
+        self.table = QTableView(self)
+        self.table.setModel(self.model)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setSortIndicator(0, Qt.AscendingOrder)
         self.table.setSortingEnabled(True)
+        self.model.more_requested.connect(self.load_next_page)
+        self.model.sort_requested.connect(self.reload)
 
         self.layout.addWidget(self.table)
 
+        self.bottom_layout = QHBoxLayout()
+        self.bottom_layout.addStretch()
+        self.layout.addLayout(self.bottom_layout)
+
+        self.import_button = QPushButton("Импорт")
+        self.import_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        self.import_button.clicked.connect(self.show_import_dialog)
+        self.bottom_layout.addWidget(self.import_button)
+
+        self.export_button = QPushButton("Экспорт")
+        self.export_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        self.export_button.clicked.connect(self.show_export_dialog)
+        self.bottom_layout.addWidget(self.export_button)
+
+        self.diagnostics_button = QPushButton("Диагностика")
+        self.diagnostics_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        self.diagnostics_button.clicked.connect(self.show_diagnostics_dialog)
+        self.bottom_layout.addWidget(self.diagnostics_button)
+
         self.utils_button = QPushButton("Утилиты")
         self.utils_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
         self.utils_button.clicked.connect(self.show_utils_dialog)
-        self.layout.addWidget(self.utils_button, alignment=Qt.AlignRight)
+        self.bottom_layout.addWidget(self.utils_button)
+
+        self.batch_button = QPushButton("Пакетная правка")
+        self.batch_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        self.batch_button.clicked.connect(self.show_batch_dialog)
+        self.bottom_layout.addWidget(self.batch_button)
+
+        self.dedupe_button = QPushButton("Дубликаты")
+        self.dedupe_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        self.dedupe_button.clicked.connect(self.find_duplicates)
+        self.bottom_layout.addWidget(self.dedupe_button)
+
+        self.tasks = []
+
+        self.listener = ChangeListener(self.db, parent=self)
+        self.listener.changed.connect(self.on_data_changed)
 
-        self.update_table()
+        self.live = False
+        self.snapshot_rows = None
+        self.load_snapshot()
 
         self.filter_timer = QTimer()
         self.filter_timer.setInterval(300)
         self.filter_timer.setSingleShot(True)
         self.filter_timer.timeout.connect(self.apply_column_filters)
 
+        self.replica_timer = QTimer(self)
+        self.replica_timer.setInterval(REPLICA_SYNC_INTERVAL)
+        self.replica_timer.timeout.connect(self.sync_replica)
+
+    def load_snapshot(self):
+        snapshot = read_snapshot()
+        if snapshot is None:
+            return
+        rows, meta = snapshot
+        self.search_input.blockSignals(True)
+        self.search_input.setText(meta['search_term'])
+        self.search_input.blockSignals(False)
+        for header, value in meta['filters'].items():
+            if header in self.filter_widgets:
+                self.filter_widgets[header].blockSignals(True)
+                self.filter_widgets[header].setText(value)
+                self.filter_widgets[header].blockSignals(False)
+        self.model.sort_column = meta['sort_column']
+        self.model.descending = meta['descending']
+        self.table.horizontalHeader().setSortIndicator(
+            meta['sort_column'], Qt.DescendingOrder if meta['descending'] else Qt.AscendingOrder
+        )
+        self.active_filters = self.current_filters()
+        self.model.set_rows(rows, exhausted=True)
+        self.snapshot_rows = set(self.model.rows)
+        logger.debug(f"Painted {len(rows)} rows from the snapshot")
+
+    def save_snapshot(self):
+        try:
+            write_snapshot(
+                self.model.rows[:PAGE_SIZE], *self.active_filters, self.model.sort_column, self.model.descending
+            )
+        except (OSError, TypeError, OverflowError) as e:
+            logger.error(f"Error {e} while saving the snapshot")
+
+    def start(self, prepare):
+        task = BackgroundTask(lambda report: prepare(), self)
+
+        def finish():
+            self.tasks.remove(task)
+            task.deleteLater()
+            self.listener.start()
+
+        def succeeded(result):
+            finish()
+            self.reload()
+
+        def failed(message):
+            finish()
+            QMessageBox.critical(self, "Ошибка", f"Не удалось подключиться к базе данных:\n{message}")
+            logger.error("Failed to connect to the database")
+
+        task.succeeded.connect(succeeded)
+        task.failed.connect(failed)
+        self.tasks.append(task)
+        task.start()
+
     def update_table(self):
-        query = """
-            SELECT d.uid, s.value AS surname, n.value AS name, p.value AS patronymic,
-                   d.city, d.street, d.house, d.telephone
-            FROM directory d
-            JOIN surnames s ON d.surname = s.uid
-            JOIN names n ON d.name = n.uid
-            JOIN patronymics p ON d.patronymic = p.uid;
-        """
-        rows = self.db.fetch_all(query)
-        self.display_rows(rows)
-
-    def display_rows(self, rows):
-        self.table.setRowCount(len(rows))
-        for row_idx, row_data in enumerate(rows):
-            for col_idx, col_data in enumerate(row_data):
-                item = QTableWidgetItem(str(col_data))
-                item.setFlags(item.flags() ^ Qt.ItemIsEditable)
-                self.table.setItem(row_idx, col_idx, item)
+        self.result_cache.clear()
+        self.load_first_page('', {})
+
+    def reload(self):
+        self.load_first_page(*self.active_filters)
+
+    def load_first_page(self, search_term, filters):
+        self.active_filters = (search_term, filters)
+        if self.replica is not None:
+            self.executor.cancel()
+            self.model.set_rows(self.replica.search(
+                search_term, filters, self.model.sort_column, self.model.descending, limit=PAGE_SIZE
+            ))
+            return
+        if self.memory_index is not None:
+            self.executor.cancel()
+            self.local_rows = self.memory_index.search(
+                search_term, filters, self.model.sort_column, self.model.descending
+            )
+            self.model.set_rows(self.local_rows[:PAGE_SIZE])
+            return
+        rows = self.result_cache.lookup(search_term, filters, self.model.sort_column, self.model.descending)
+        if rows is not None:
+            self.executor.cancel()
+            self.model.set_rows(rows, exhausted=True)
+            return
+        query, params = build_filter_query(
+            search_term, filters, self.model.sort_column, self.model.descending, limit=PAGE_SIZE
+        )
+        self.model.begin_loading()
+        self.append_generation = None
+        self.executor.submit(query, params)
+
+    def load_next_page(self):
+        if self.replica is not None:
+            search_term, filters = self.active_filters
+            self.model.append_rows(self.replica.search(
+                search_term, filters, self.model.sort_column, self.model.descending,
+                after=self.model.last_key(), limit=PAGE_SIZE
+            ))
+            return
+        if self.memory_index is not None:
+            start = len(self.model.rows)
+            self.model.append_rows(self.local_rows[start:start + PAGE_SIZE])
+            return
+        search_term, filters = self.active_filters
+        query, params = build_filter_query(
+            search_term, filters, self.model.sort_column, self.model.descending,
+            after=self.model.last_key(), limit=PAGE_SIZE
+        )
+        self.append_generation = self.executor.submit(query, params)
+
+    def on_query_finished(self, generation, rows):
+        if not self.executor.is_current(generation):
+            return
+        if generation == self.append_generation:
+            self.model.append_rows(rows)
+        else:
+            self.model.set_rows(rows)
+            self.on_live_page(rows)
+        if self.model.exhausted:
+            search_term, filters = self.active_filters
+            self.result_cache.store(
+                search_term, filters, self.model.sort_column, self.model.descending, self.model.rows
+            )
+
+    def on_live_page(self, rows):
+        if self.live:
+            return
+        self.live = True
+        if self.snapshot_rows is not None:
+            stale = len(self.snapshot_rows.symmetric_difference(rows))
+            logger.debug(f"Reconciled the snapshot with the server: {stale} rows differed")
+            self.snapshot_rows = None
+        self.first_page_loaded.emit()
+
+    def on_data_changed(self, table, uids):
+        self.result_cache.clear()
+        if table in DICTIONARY_COLUMNS:
+            self.completions.invalidate(table)
+            if uids is None:
+                self.db.dictionaries.invalidate(table)
+            else:
+                self.db.dictionaries.invalidate_uids(table, uids)
+        if self.replica is not None:
+            self.sync_replica()
+            return
+        if uids is None:
+            if self.memory_index is not None:
+                self.load_memory_index()
+            else:
+                self.reload()
+            return
+        if table not in DICTIONARY_COLUMNS and table != 'directory':
+            return
+        self.pending_changes.append((table, uids))
+        self.fetch_pending_changes()
+
+    def fetch_pending_changes(self):
+        if self.change_task is not None or not self.pending_changes:
+            return
+        changes, self.pending_changes = self.pending_changes, []
+        active_filters = self.active_filters
+        memory_index = self.memory_index
+        loaded_uids = None if memory_index is not None else self.model.loaded_uids()
+        task = BackgroundTask(lambda report: self.fetch_changes(changes, active_filters, loaded_uids), self)
+        self.change_task = task
+
+        def finish():
+            self.tasks.remove(task)
+            task.deleteLater()
+            self.change_task = None
+            self.fetch_pending_changes()
+
+        def succeeded(patches):
+            if self.active_filters == active_filters and self.memory_index is memory_index:
+                for uids, rows in patches:
+                    self.apply_change_patch(uids, rows)
+            finish()
+
+        def failed(message):
+            logger.error(f"Failed to apply a change notification, reloading: {message}")
+            finish()
+            self.reload()
+
+        task.succeeded.connect(succeeded)
+        task.failed.connect(failed)
+        self.tasks.append(task)
+        task.start()
+
+    def fetch_changes(self, changes, active_filters, loaded_uids):
+        search_term, filters = active_filters
+        patches = []
+        for table, uids in changes:
+            if table in DICTIONARY_COLUMNS:
+                query = f"SELECT uid FROM directory WHERE {DICTIONARY_COLUMNS[table]} = ANY(%s)"
+                params = (uids,)
+                if loaded_uids is not None:
+                    query += " AND uid = ANY(%s)"
+                    params += (loaded_uids,)
+                rows = self.db.fetch_all(query + ";", params, raise_errors=True)
+                uids = [row[0] for row in rows]
+            if not uids:
+                continue
+            if loaded_uids is None:
+                query, params = build_filter_query(uids=uids)
+            else:
+                query, params = build_filter_query(search_term, filters, uids=uids)
+            patches.append((uids, self.db.fetch_all(query, params, raise_errors=True)))
+        return patches
+
+    def apply_change_patch(self, uids, rows):
+        if self.memory_index is not None:
+            search_term, filters = self.active_filters
+            self.memory_index.apply_changes(uids, rows)
+            self.local_rows = self.memory_index.search(
+                search_term, filters, self.model.sort_column, self.model.descending
+            )
+            rows = [row for row in rows if MemoryDirectory.matches(row, search_term, filters)]
+        self.model.apply_changes(uids, rows)
+
+    def on_query_failed(self, generation, message):
+        if not self.executor.is_current(generation):
+            return
+        self.model.cancel_loading()
+        QMessageBox.critical(self, "Ошибка", f"Не удалось выполнить фильтрацию:\n{message}")
+        logger.error("Failed to apply filters")
 
     def search(self):
         self.search_input.text().strip()
         self.filter_timer.start()
 
-    def apply_column_filters(self):
+    def current_filters(self):
         filters = {}
         for header, widget in self.filter_widgets.items():
             text = widget.text().strip()
@@ -122,68 +419,247 @@ class MainWindow(QWidget):
                 filters[header] = text
 
         search_term = self.search_input.text().strip()
+        return search_term, filters
+
+    def apply_column_filters(self):
+        self.load_first_page(*self.current_filters())
 
-        base_query = """
-            SELECT d.uid, s.value AS surname, n.value AS name, p.value AS patronymic,
-                   d.city, d.street, d.house, d.telephone
-            FROM directory d
-            JOIN surnames s ON d.surname = s.uid
-            JOIN names n ON d.name = n.uid
-            JOIN patronymics p ON d.patronymic = p.uid
-        """
-        conditions = []
-        params = []
-
-        if search_term:
-            conditions.append("""
-                (s.value ILIKE %s
-                OR n.value ILIKE %s
-                OR p.value ILIKE %s
-                OR d.city ILIKE %s
-                OR d.street ILIKE %s
-                OR d.house::text ILIKE %s
-                OR d.telephone ILIKE %s)
-            """)
-            like_term = f'%{search_term}%'
-            params.extend([like_term] * 7)
-
-        header_to_field = {
-            'ID': 'd.uid',
-            'Фамилия': 's.value',
-            'Имя': 'n.value',
-            'Отчество': 'p.value',
-            'Город': 'd.city',
-            'Улица': 'd.street',
-            'Дом': 'd.house::text',
-            'Телефон': 'd.telephone'
-        }
-
-        for header, value in filters.items():
-            field = header_to_field.get(header, None)
-            if field:
-                conditions.append(f"{field} ILIKE %s")
-                params.append(f'%{value}%')
-
-        if conditions:
-            where_clause = " WHERE " + " AND ".join(conditions)
+    def toggle_memory_index(self, enabled):
+        if enabled:
+            self.replica_checkbox.setChecked(False)
+            self.load_memory_index()
         else:
-            where_clause = ""
+            self.memory_index = None
+            self.local_rows = []
+            self.reload()
+
+    def load_memory_index(self):
+        def loaded(index):
+            if not self.memory_checkbox.isChecked():
+                return
+            self.memory_index = index
+            logger.debug(f"Loaded {len(index)} entries into the local index")
+            self.reload()
+
+        self.run_background_task(
+            "Загрузка локального индекса",
+            lambda report: MemoryDirectory.load(self.db, report),
+            loaded,
+            lambda: self.memory_checkbox.setChecked(self.memory_index is not None),
+        )
+
+    def toggle_replica(self, enabled):
+        if not enabled:
+            self.replica_timer.stop()
+            if self.replica is not None:
+                self.replica.close()
+                self.replica = None
+                self.reload()
+            return
+
+        self.memory_checkbox.setChecked(False)
+        replica = LocalReplica()
+
+        def loaded(uids):
+            if not self.replica_checkbox.isChecked():
+                replica.close()
+                return
+            self.replica = replica
+            self.replica_timer.start()
+            logger.debug("Serving reads from the local replica")
+            self.reload()
+
+        self.run_background_task(
+            "Синхронизация локальной копии",
+            lambda report: replica.sync(self.db, report),
+            loaded,
+            lambda: self.replica_checkbox.setChecked(self.replica is not None),
+        )
+
+    def sync_replica(self):
+        if self.replica is None:
+            return
+        if self.replica_task is not None:
+            self.replica_pending = True
+            return
+        replica = self.replica
+        task = BackgroundTask(lambda report: replica.sync(self.db), self)
+        self.replica_task = task
+
+        def finish():
+            self.tasks.remove(task)
+            task.deleteLater()
+            self.replica_task = None
+            if self.replica_pending:
+                self.replica_pending = False
+                self.sync_replica()
+
+        def succeeded(uids):
+            self.on_replica_synced(uids)
+            finish()
+
+        def failed(message):
+            logger.error(f"Failed to synchronize the local replica: {message}")
+            finish()
+
+        task.succeeded.connect(succeeded)
+        task.failed.connect(failed)
+        self.tasks.append(task)
+        task.start()
+
+    def on_replica_synced(self, uids):
+        if self.replica is None or uids == []:
+            return
+        if uids is None:
+            self.reload()
+            return
+        search_term, filters = self.active_filters
+        self.model.apply_changes(uids, self.replica.search(search_term, filters, uids=uids))
+
+    def run_background_task(self, title, function, on_success, on_failure=None):
+        progress = QProgressDialog(title, "Отмена", 0, 100, self)
+        progress.setWindowTitle(title)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        task = BackgroundTask(function, self)
+        progress.canceled.connect(task.cancel)
+        task.progress.connect(lambda percent, message: (progress.setValue(percent), progress.setLabelText(message)))
+
+        def finish():
+            progress.reset()
+            self.tasks.remove(task)
+            task.deleteLater()
 
-        final_query = base_query + where_clause + ";"
+        def succeeded(result):
+            finish()
+            on_success(result)
 
+        def failed(message):
+            finish()
+            QMessageBox.critical(self, "Ошибка", f"{title}: ошибка\n{message}")
+            logger.error(f"{title} failed")
+            if on_failure:
+                on_failure()
+
+        task.succeeded.connect(succeeded)
+        task.failed.connect(failed)
+        self.tasks.append(task)
+        task.start()
+
+    def show_import_dialog(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Импорт контактов", "", "Контакты (*.csv *.vcf *.vcard);;Все файлы (*)"
+        )
+        if not path:
+            return
+        importer = BulkImporter(self.db)
+        self.run_background_task(
+            "Импорт контактов",
+            lambda report: importer.run(path, report=report),
+            self.on_import_finished,
+        )
+
+    def on_import_finished(self, result):
+        QMessageBox.information(self, "Успех", result.summary())
+        logger.debug(f"{result.summary()}")
+        if self.memory_index is not None:
+            self.load_memory_index()
+        else:
+            self.update_table()
+
+    def show_export_dialog(self):
+        search_term, filters = self.current_filters()
+        if search_term or filters:
+            answer = QMessageBox.question(
+                self,
+                "Экспорт",
+                "Выгрузить только текущую выборку?\nНет — выгрузить весь справочник.",
+                QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel
+            )
+            if answer == QMessageBox.Cancel:
+                return
+            if answer == QMessageBox.No:
+                search_term, filters = '', {}
+
+        path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Экспорт контактов", "", "CSV (*.csv);;JSON Lines (*.jsonl)"
+        )
+        if not path:
+            return
+        file_format = 'jsonl' if 'jsonl' in selected_filter or path.endswith('.jsonl') else 'csv'
+        self.run_background_task(
+            "Экспорт контактов",
+            lambda report: export_rows(self.db, path, file_format, search_term, filters, report=report),
+            lambda exported: QMessageBox.information(self, "Успех", f"Выгружено записей: {exported}"),
+        )
+
+    def closeEvent(self, event):
+        for task in self.tasks:
+            task.cancel()
+            task.wait()
+        self.executor.shutdown()
+        self.listener.stop()
+        if self.replica is not None:
+            self.replica.close()
+        if self.live:
+            self.save_snapshot()
+        super().closeEvent(event)
+
+    def show_diagnostics_dialog(self):
+        DiagnosticsDialog(self.executor.statements, self).exec_()
+
+    def with_completions(self, show_dialog):
+        if not self.completions.loaded():
+            self.run_background_task(
+                "Загрузка подсказок",
+                lambda report: self.completions.refresh(self.db, report),
+                lambda completions: show_dialog(),
+                show_dialog,
+            )
+            return
         try:
-            rows = self.db.fetch_all(final_query, params)
-            self.display_rows(rows)
+            self.completions.refresh(self.db)
         except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось выполнить фильтрацию:\n{e}")
-            print("[ERROR] Failed to apply filters")
+            logger.error(f"Error {e} while refreshing completions")
+        show_dialog()
 
     def show_utils_dialog(self):
-        dialog = UtilsDialog(self.db)
-        if dialog.exec_() == QDialog.Accepted:
-            self.update_table()
+        def show_dialog():
+            dialog = UtilsDialog(self.db, self.completions)
+            if dialog.exec_() == QDialog.Accepted and not self.listener.active:
+                self.on_data_changed('directory', dialog.changed_uids)
+
+        self.with_completions(show_dialog)
+
+    def show_batch_dialog(self):
+        rows = sorted(index.row() for index in self.table.selectionModel().selectedRows())
+        uids = [self.model.rows.value(row, 0) for row in rows]
+
+        def show_dialog():
+            dialog = BatchEditDialog(self.db, uids, self.completions)
+            if dialog.exec_() == QDialog.Accepted and not self.listener.active:
+                self.on_data_changed('directory', dialog.changed_uids)
+
+        self.with_completions(show_dialog)
+
+    def find_duplicates(self):
+        self.run_background_task(
+            "Поиск дубликатов",
+            lambda report: DuplicateFinder(self.db).run(report),
+            self.show_dedupe_dialog,
+        )
+
+    def show_dedupe_dialog(self, proposals):
+        if not proposals:
+            QMessageBox.information(self, "Дубликаты", "Дубликаты не найдены.")
+            return
+        dialog = DedupeDialog(self.db, proposals)
+        if dialog.exec_() == QDialog.Accepted and not self.listener.active:
+            self.on_data_changed('directory', dialog.changed_uids)
 
     def show_manage_dialog(self, table_name, title):
         dialog = ManageParentDialog(self.db, table_name, title)
-        if dialog.exec_() == QDialog.Accepted:
-            self.update_table()
+        self.completions.invalidate(table_name)
+        dialog.exec_()
+        if dialog.changed and not self.listener.active:
+            self.on_data_changed(table_name, None)
@@ -1,8 +1,16 @@
+import logging
 from PyQt5.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
     QPushButton, QMessageBox, QLineEdit, QLabel, QHeaderView
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
+from dictionary_resolver import DICTIONARY_COLUMNS
+from query_builder import prefix_pattern
+
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 200
 
 
 class ManageParentDialog(QDialog):
@@ -10,20 +18,38 @@ class ManageParentDialog(QDialog):
         super().__init__()
         self.db = db
         self.table_name = table_name
+        self.column = DICTIONARY_COLUMNS[table_name]
+        self.last_uid = 0
+        self.exhausted = False
+        self.changed = False
         self.setWindowTitle(f"Управление {title}")
         self.resize(600, 400)
 
         self.layout = QVBoxLayout()
         self.setLayout(self.layout)
 
+        self.search_input = QLineEdit(self)
+        self.search_input.setPlaceholderText("Поиск по началу значения...")
+        self.search_input.textChanged.connect(lambda: self.search_timer.start())
+        self.layout.addWidget(self.search_input)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setInterval(300)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self.load_data)
+
         self.table = QTableWidget(self)
-        self.table.setColumnCount(2)
-        self.table.setHorizontalHeaderLabels(['UID', 'Value'])
+        self.table.setColumnCount(3)
+        self.table.setHorizontalHeaderLabels(['UID', 'Value', 'Записей'])
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.table.setSelectionBehavior(QTableWidget.SelectRows)
         self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalScrollBar().valueChanged.connect(self.on_scrolled)
         self.layout.addWidget(self.table)
 
+        self.status_label = QLabel(self)
+        self.layout.addWidget(self.status_label)
+
         self.form_layout = QHBoxLayout()
 
         self.value_label = QLabel("Value:", self)
@@ -48,6 +74,10 @@ class ManageParentDialog(QDialog):
         self.delete_button.clicked.connect(self.delete_entry)
         self.buttons_layout.addWidget(self.delete_button)
 
+        self.cleanup_button = QPushButton("Удалить неиспользуемые", self)
+        self.cleanup_button.clicked.connect(self.delete_unused)
+        self.buttons_layout.addWidget(self.cleanup_button)
+
         self.refresh_button = QPushButton("Обновить Таблицу", self)
         self.refresh_button.clicked.connect(self.load_data)
         self.buttons_layout.addWidget(self.refresh_button)
@@ -57,66 +87,133 @@ class ManageParentDialog(QDialog):
         self.load_data()
 
     def load_data(self):
-        query = f"SELECT uid, value FROM {self.table_name} ORDER BY uid ASC;"
-        rows = self.db.fetch_all(query)
-        self.table.setRowCount(len(rows))
-
-        for row_idx, row_data in enumerate(rows):
-            uid_item = QTableWidgetItem(str(row_data[0]))
-            uid_item.setFlags(uid_item.flags() ^ Qt.ItemIsEditable)
-            value_item = QTableWidgetItem(str(row_data[1]))
-            value_item.setFlags(value_item.flags() ^ Qt.ItemIsEditable)
-            self.table.setItem(row_idx, 0, uid_item)
-            self.table.setItem(row_idx, 1, value_item)
+        self.last_uid = 0
+        self.exhausted = False
+        self.table.setRowCount(0)
+        self.load_next_page()
+
+    def page_query(self):
+        conditions = ["uid > %s"]
+        params = [self.last_uid]
+        prefix = self.search_input.text().strip()
+        if prefix:
+            conditions.append("lower(value) LIKE lower(%s)")
+            params.append(prefix_pattern(prefix))
+        params.append(PAGE_SIZE)
+        query = f"""
+            SELECT t.uid, t.value, count(d.uid)
+            FROM (
+                SELECT uid, value FROM {self.table_name}
+                WHERE {' AND '.join(conditions)}
+                ORDER BY uid
+                LIMIT %s
+            ) t
+            LEFT JOIN directory d ON d.{self.column} = t.uid
+            GROUP BY t.uid, t.value
+            ORDER BY t.uid;
+        """
+        return query, params
+
+    def load_next_page(self):
+        if self.exhausted:
+            return
+        rows = self.db.fetch_all(*self.page_query())
+        self.exhausted = len(rows) < PAGE_SIZE
+        offset = self.table.rowCount()
+        self.table.setRowCount(offset + len(rows))
+
+        for row_idx, row_data in enumerate(rows, offset):
+            for column, value in enumerate(row_data):
+                item = QTableWidgetItem(str(value))
+                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+                self.table.setItem(row_idx, column, item)
+        if rows:
+            self.last_uid = rows[-1][0]
+        shown = self.table.rowCount()
+        self.status_label.setText(f"Показано: {shown}" if self.exhausted else f"Показано: {shown}, прокрутите для загрузки")
+
+    def on_scrolled(self, value):
+        if value == self.table.verticalScrollBar().maximum():
+            self.load_next_page()
+
+    def delete_unused(self):
+        confirm = QMessageBox.question(
+            self,
+            "Подтверждение",
+            "Удалить все значения, которые не используются в справочнике?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if confirm != QMessageBox.Yes:
+            return
+
+        query = f"""
+            DELETE FROM {self.table_name} t
+            WHERE NOT EXISTS (SELECT 1 FROM directory d WHERE d.{self.column} = t.uid);
+        """
+        try:
+            with self.db.transaction() as cursor:
+                cursor.execute(query)
+                deleted = cursor.rowcount
+            self.db.dictionaries.invalidate(self.table_name)
+            self.changed = True
+            QMessageBox.information(self, "Успех", f"Удалено неиспользуемых записей: {deleted}")
+            logger.debug(f"Deleted {deleted} unused entries from {self.table_name}")
+            self.load_data()
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось удалить неиспользуемые записи:\n{e}")
+            logger.error(f"Error {e} while deleting unused entries from {self.table_name}")
 
     def add_entry(self):
         value = self.value_input.text().strip()
         if not value:
             QMessageBox.warning(self, "Ошибка", "Пожалуйста, введите значение.")
-            print("[ERROR] No value entered")
+            logger.error("No value entered")
             return
 
         query = f"INSERT INTO {self.table_name} (value) VALUES (%s) RETURNING uid;"
         try:
             self.db.execute_query(query, (value,))
+            self.changed = True
             QMessageBox.information(self, "Успех", "Запись успешно добавлена!")
-            print("[DEBUG] The entry was successfully added")
+            logger.debug("The entry was successfully added")
             self.load_data()
             self.value_input.clear()
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось добавить запись:\n{e}")
-            print("[ERROR] Failed to add an entry")
+            logger.error("Failed to add an entry")
 
     def update_entry(self):
         selected_items = self.table.selectedItems()
         if not selected_items:
             QMessageBox.warning(self, "Ошибка", "Пожалуйста, выберите запись для обновления.")
-            print("[ERROR] No entry selected for update")
+            logger.error("No entry selected for update")
             return
 
         uid = selected_items[0].text()
         new_value = self.value_input.text().strip()
         if not new_value:
             QMessageBox.warning(self, "Ошибка", "Пожалуйста, введите новое значение.")
-            print("[ERROR] No new value entered")
+            logger.error("No new value entered")
             return
 
         query = f"UPDATE {self.table_name} SET value = %s WHERE uid = %s;"
         try:
             self.db.execute_query(query, (new_value, uid))
+            self.db.dictionaries.invalidate(self.table_name, int(uid))
+            self.changed = True
             QMessageBox.information(self, "Успех", "Запись успешно обновлена!")
-            print("[DEBUG] The entry was successfully updated")
+            logger.debug("The entry was successfully updated")
             self.load_data()
             self.value_input.clear()
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось обновить запись:\n{e}")
-            print("[ERROR] Failed to update an entry")
+            logger.error("Failed to update an entry")
 
     def delete_entry(self):
         selected_items = self.table.selectedItems()
         if not selected_items:
             QMessageBox.warning(self, "Ошибка", "Пожалуйста, выберите запись для удаления.")
-            print("[ERROR] No entry selected for deletion")
+            logger.error("No entry selected for deletion")
             return
 
         uid = selected_items[0].text()
@@ -132,10 +229,12 @@ class ManageParentDialog(QDialog):
             query = f"DELETE FROM {self.table_name} WHERE uid = %s;"
             try:
                 self.db.execute_query(query, (uid,))
+                self.db.dictionaries.invalidate(self.table_name, int(uid))
+                self.changed = True
                 QMessageBox.information(self, "Успех", "Запись успешно удалена!")
-                print("[DEBUG] The entry was successfully deleted")
+                logger.debug("The entry was successfully deleted")
                 self.load_data()
                 self.value_input.clear()
             except Exception as e:
                 QMessageBox.critical(self, "Ошибка", f"Не удалось удалить запись:\n{e}")
-                print("[ERROR] Failed to delete an entry")
+                logger.error("Failed to delete an entry")
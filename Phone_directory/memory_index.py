@@ -0,0 +1,206 @@
+import array
+import uuid
+from collections import defaultdict
+
+from phone_numbers import is_phone_query, normalize_phone, phone_matcher
+from query_builder import BASE_QUERY, SEARCH_FIELDS
+
+
+HEADERS = ['ID', 'Фамилия', 'Имя', 'Отчество', 'Город', 'Улица', 'Дом', 'Телефон']
+GRAM_SIZE = 3
+MAX_INDEXED_VALUES = 200_000
+LOAD_ITERSIZE = 5000
+
+
+def grams(text):
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def fold(value):
+    return str(value).casefold()
+
+
+def value_matches(header, value, needle):
+    if header == 'Телефон' and is_phone_query(needle):
+        return phone_matcher(needle)(normalize_phone(value))
+    return needle.casefold() in fold(value)
+
+
+class ColumnIndex:
+    def __init__(self, phone=False):
+        self.normalized = [] if phone else None
+        self.values = []
+        self.folded = []
+        self.ids = {}
+        self.postings = []
+        self.grams = defaultdict(set)
+
+    def intern(self, value):
+        value_id = self.ids.get(value)
+        if value_id is not None:
+            return value_id
+        value_id = len(self.values)
+        folded = fold(value)
+        self.ids[value] = value_id
+        self.values.append(value)
+        self.folded.append(folded)
+        self.postings.append(None)
+        if self.normalized is not None:
+            self.normalized.append(normalize_phone(value))
+        if self.grams is not None:
+            for gram in grams(folded):
+                self.grams[gram].add(value_id)
+            if len(self.values) > MAX_INDEXED_VALUES:
+                self.grams = None
+        return value_id
+
+    def add(self, position, value):
+        value_id = self.intern(value)
+        posting = self.postings[value_id]
+        if posting is None:
+            self.postings[value_id] = position
+        elif isinstance(posting, int):
+            self.postings[value_id] = {posting, position}
+        else:
+            posting.add(position)
+        return value_id
+
+    def discard(self, position, value_id):
+        posting = self.postings[value_id]
+        if posting == position:
+            self.postings[value_id] = None
+        elif isinstance(posting, set):
+            posting.discard(position)
+
+    def matching_values(self, needle):
+        if self.normalized is not None and is_phone_query(needle):
+            matcher = phone_matcher(needle)
+            return [value_id for value_id, digits in enumerate(self.normalized) if matcher(digits)]
+        folded = needle.casefold()
+        if self.grams is not None and len(folded) >= GRAM_SIZE:
+            postings = sorted((self.grams.get(gram, set()) for gram in grams(folded)), key=len)
+            candidates = postings[0].intersection(*postings[1:])
+            return [value_id for value_id in candidates if folded in self.folded[value_id]]
+        return [value_id for value_id, text in enumerate(self.folded) if folded in text]
+
+    def matching_rows(self, needle):
+        rows = set()
+        for value_id in self.matching_values(needle):
+            posting = self.postings[value_id]
+            if posting is None:
+                continue
+            if isinstance(posting, int):
+                rows.add(posting)
+            else:
+                rows.update(posting)
+        return rows
+
+
+class MemoryDirectory:
+    def __init__(self):
+        self.uids = []
+        self.positions = {}
+        self.free = []
+        self.columns = [ColumnIndex(phone=header == 'Телефон') for header in HEADERS[1:]]
+        self.value_ids = [array.array('I') for _ in HEADERS[1:]]
+        self.sorted_cache = {}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add(self, row):
+        uid = row[0]
+        if uid in self.positions:
+            self.remove(uid)
+        if self.free:
+            position = self.free.pop()
+            self.uids[position] = uid
+            for column, ids, value in zip(self.columns, self.value_ids, row[1:]):
+                ids[position] = column.add(position, value)
+        else:
+            position = len(self.uids)
+            self.uids.append(uid)
+            for column, ids, value in zip(self.columns, self.value_ids, row[1:]):
+                ids.append(column.add(position, value))
+        self.positions[uid] = position
+        self.sorted_cache.clear()
+
+    def remove(self, uid):
+        position = self.positions.pop(uid, None)
+        if position is None:
+            return
+        for column, ids in zip(self.columns, self.value_ids):
+            column.discard(position, ids[position])
+        self.uids[position] = None
+        self.free.append(position)
+        self.sorted_cache.clear()
+
+    def apply_changes(self, uids, rows):
+        for uid in uids:
+            self.remove(uid)
+        for row in rows:
+            self.add(row)
+
+    def row(self, position):
+        return (self.uids[position],) + tuple(
+            column.values[ids[position]] for column, ids in zip(self.columns, self.value_ids)
+        )
+
+    def header_rows(self, header, needle):
+        if header == 'ID':
+            return {position for uid, position in self.positions.items() if needle in str(uid)}
+        return self.columns[HEADERS.index(header) - 1].matching_rows(needle)
+
+    def matching_positions(self, search_term, filters):
+        candidates = []
+        if search_term:
+            rows = set()
+            for header in SEARCH_FIELDS:
+                rows |= self.header_rows(header, search_term)
+            candidates.append(rows)
+        for header, value in filters.items():
+            if header in HEADERS:
+                candidates.append(self.header_rows(header, value))
+        if not candidates:
+            return None
+        candidates.sort(key=len)
+        return candidates[0].intersection(*candidates[1:])
+
+    def search(self, search_term='', filters=None, sort_column=0, descending=False):
+        positions = self.matching_positions(search_term, filters or {})
+        if positions is None:
+            key = (sort_column, descending)
+            if key not in self.sorted_cache:
+                self.sorted_cache.clear()
+                self.sorted_cache[key] = self.sorted_rows(self.positions.values(), sort_column, descending)
+            return self.sorted_cache[key]
+        return self.sorted_rows(positions, sort_column, descending)
+
+    def sorted_rows(self, positions, sort_column, descending):
+        rows = [self.row(position) for position in positions]
+        rows.sort(key=lambda row: (row[sort_column], row[0]), reverse=descending)
+        return rows
+
+    @staticmethod
+    def matches(row, search_term='', filters=None):
+        if search_term and not any(
+            value_matches(header, row[HEADERS.index(header)], search_term) for header in SEARCH_FIELDS
+        ):
+            return False
+        for header, value in (filters or {}).items():
+            if header in HEADERS and not value_matches(header, row[HEADERS.index(header)], value):
+                return False
+        return True
+
+    @classmethod
+    def load(cls, db, report=None):
+        index = cls()
+        total = db.fetch_one("SELECT count(*) FROM directory;")[0] if report else 0
+        with db.connection() as conn, conn.cursor(name=f"memory_index_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = LOAD_ITERSIZE
+            cursor.execute(BASE_QUERY)
+            for count, row in enumerate(cursor, 1):
+                index.add(row)
+                if report and count % LOAD_ITERSIZE == 0:
+                    report(count * 100 // max(total, 1), f"Загружено {count} из {total} записей")
+        return index
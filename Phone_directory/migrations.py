@@ -0,0 +1,425 @@
+import logging
+import sys
+
+import psycopg2
+
+from phone_numbers import normalized_phone_sql
+
+
+logger = logging.getLogger(__name__)
+
+NAME_DICTIONARIES = {'surnames': 'surname', 'names': 'name', 'patronymics': 'patronymic'}
+PLACE_DICTIONARIES = {'cities': 'city', 'streets': 'street'}
+BACKFILL_BATCH_SIZE = 50_000
+CHANGE_RETENTION = '7 days'
+CHANGE_PRUNE_EVERY = 1000
+
+
+class BatchedUpdate:
+    def __init__(self, query, batch_size=BACKFILL_BATCH_SIZE):
+        self.query = query
+        self.batch_size = batch_size
+
+    def run(self, db):
+        low, high = db.fetch_one("SELECT coalesce(min(uid), 0), coalesce(max(uid), 0) FROM directory;")
+        updated = 0
+        for start in range(low, high + 1, self.batch_size):
+            with db.transaction() as cursor:
+                cursor.execute(self.query, {'low': start, 'high': start + self.batch_size})
+                updated += cursor.rowcount
+        logger.debug(f"Backfilled {updated} rows in batches of {self.batch_size}")
+
+
+class OutsideTransaction:
+    def __init__(self, query):
+        self.query = query
+
+    def run(self, db):
+        with db.connection() as conn:
+            conn.autocommit = True
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(self.query)
+            finally:
+                conn.autocommit = False
+
+
+STANDALONE_STEPS = (BatchedUpdate, OutsideTransaction)
+
+
+def unique_values_steps(table, column):
+    return [
+        f"""
+        UPDATE directory d
+        SET {column} = m.keep
+        FROM (SELECT uid, min(uid) OVER (PARTITION BY value) AS keep FROM {table}) m
+        WHERE d.{column} = m.uid AND m.uid <> m.keep;
+        """,
+        f"DELETE FROM {table} t USING {table} k WHERE t.value = k.value AND t.uid > k.uid;",
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_value_key ON {table} (value);",
+    ]
+
+
+NOTIFY_FUNCTION = """
+    CREATE OR REPLACE FUNCTION notify_directory_changes() RETURNS trigger AS $$
+    DECLARE
+        changed BIGINT;
+        uids TEXT;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            SELECT count(*), string_agg(uid::text, ',') INTO changed, uids
+            FROM (SELECT uid FROM old_rows LIMIT 501) AS t;
+        ELSE
+            SELECT count(*), string_agg(uid::text, ',') INTO changed, uids
+            FROM (SELECT uid FROM new_rows LIMIT 501) AS t;
+        END IF;
+        IF changed = 0 THEN
+            RETURN NULL;
+        END IF;
+        IF changed > 500 THEN
+            uids := '*';
+        END IF;
+        PERFORM pg_notify('directory_changes', TG_TABLE_NAME || ':' || uids);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+
+CHANGE_LOG_FUNCTION = """
+    CREATE OR REPLACE FUNCTION log_directory_changes() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO directory_changes (table_name, uid) SELECT TG_TABLE_NAME, uid FROM old_rows;
+        ELSE
+            INSERT INTO directory_changes (table_name, uid) SELECT TG_TABLE_NAME, uid FROM new_rows;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+
+CHANGE_LOG_PRUNING_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION log_directory_changes() RETURNS trigger AS $$
+    DECLARE
+        first_id BIGINT;
+        last_id BIGINT;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            WITH logged AS (
+                INSERT INTO directory_changes (table_name, uid) SELECT TG_TABLE_NAME, uid FROM old_rows RETURNING id
+            )
+            SELECT min(id), max(id) INTO first_id, last_id FROM logged;
+        ELSE
+            WITH logged AS (
+                INSERT INTO directory_changes (table_name, uid) SELECT TG_TABLE_NAME, uid FROM new_rows RETURNING id
+            )
+            SELECT min(id), max(id) INTO first_id, last_id FROM logged;
+        END IF;
+        IF last_id / {CHANGE_PRUNE_EVERY} > (first_id - 1) / {CHANGE_PRUNE_EVERY} THEN
+            DELETE FROM directory_changes
+            WHERE changed_at < now() - interval '{CHANGE_RETENTION}'
+              AND xid < pg_snapshot_xmin(pg_current_snapshot())
+              AND id < first_id;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+
+TELEPHONE_DIGITS_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION normalize_directory_telephone() RETURNS trigger AS $$
+    BEGIN
+        NEW.telephone_digits := {normalized_phone_sql('NEW.telephone')};
+        NEW.telephone_reversed := reverse(NEW.telephone_digits);
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+
+def statement_trigger_steps(table, events, kind, function):
+    steps = []
+    for event in events:
+        transition = 'OLD TABLE AS old_rows' if event == 'DELETE' else 'NEW TABLE AS new_rows'
+        trigger = f"{table}_{kind}_{event.lower()}"
+        steps += [
+            f"DROP TRIGGER IF EXISTS {trigger} ON {table};",
+            f"""
+            CREATE TRIGGER {trigger} AFTER {event} ON {table}
+            REFERENCING {transition}
+            FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+            """,
+        ]
+    return steps
+
+
+def notify_trigger_steps(table, events):
+    return statement_trigger_steps(table, events, 'notify', 'notify_directory_changes')
+
+
+def change_log_trigger_steps(table, events):
+    return statement_trigger_steps(table, events, 'log', 'log_directory_changes')
+
+
+def place_dictionary_steps(table, column):
+    return [
+        f"CREATE TABLE IF NOT EXISTS {table} (uid SERIAL PRIMARY KEY, value TEXT NOT NULL);",
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_value_key ON {table} (value);",
+        f"ALTER TABLE directory ADD COLUMN IF NOT EXISTS {column}_uid INTEGER REFERENCES {table} (uid);",
+        f"INSERT INTO {table} (value) SELECT DISTINCT {column} FROM directory ON CONFLICT (value) DO NOTHING;",
+        f"""
+        CREATE OR REPLACE FUNCTION sync_directory_{column}_uid() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' OR NEW.{column} IS DISTINCT FROM OLD.{column} OR NEW.{column}_uid IS NULL THEN
+                INSERT INTO {table} (value) VALUES (NEW.{column}) ON CONFLICT (value) DO NOTHING;
+                SELECT uid INTO NEW.{column}_uid FROM {table} WHERE value = NEW.{column};
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """,
+        f"DROP TRIGGER IF EXISTS directory_{column}_uid_sync ON directory;",
+        f"""
+        CREATE TRIGGER directory_{column}_uid_sync BEFORE INSERT OR UPDATE ON directory
+        FOR EACH ROW EXECUTE FUNCTION sync_directory_{column}_uid();
+        """,
+    ]
+
+
+def place_check_steps(column):
+    return [
+        f"ALTER TABLE directory DROP CONSTRAINT IF EXISTS directory_{column}_uid_not_null;",
+        f"ALTER TABLE directory ADD CONSTRAINT directory_{column}_uid_not_null CHECK ({column}_uid IS NOT NULL) NOT VALID;",
+    ]
+
+
+def place_swap_steps(column):
+    return [
+        f"DROP TRIGGER IF EXISTS directory_{column}_uid_sync ON directory;",
+        f"DROP FUNCTION IF EXISTS sync_directory_{column}_uid();",
+        f"ALTER TABLE directory DROP COLUMN {column};",
+        f"ALTER TABLE directory RENAME COLUMN {column}_uid TO {column};",
+        f"ALTER TABLE directory ALTER COLUMN {column} SET NOT NULL;",
+        f"ALTER TABLE directory DROP CONSTRAINT directory_{column}_uid_not_null;",
+    ]
+
+
+def drop_invalid_index_step(index):
+    return f"""
+    DO $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM pg_index WHERE indexrelid = to_regclass('{index}') AND NOT indisvalid) THEN
+            DROP INDEX {index};
+        END IF;
+    END;
+    $$;
+    """
+
+
+MIGRATIONS = [
+    ('0001_trigram_search_indexes', [
+        "CREATE INDEX IF NOT EXISTS directory_surname_idx ON directory (surname);",
+        "CREATE INDEX IF NOT EXISTS directory_name_idx ON directory (name);",
+        "CREATE INDEX IF NOT EXISTS directory_patronymic_idx ON directory (patronymic);",
+        "ANALYZE directory;",
+    ]),
+    ('0002_unique_dictionary_values', [
+        step for table, column in NAME_DICTIONARIES.items() for step in unique_values_steps(table, column)
+    ]),
+    ('0003_keyset_sort_indexes', [
+        "CREATE INDEX IF NOT EXISTS directory_surname_uid_idx ON directory (surname, uid);",
+        "CREATE INDEX IF NOT EXISTS directory_name_uid_idx ON directory (name, uid);",
+        "CREATE INDEX IF NOT EXISTS directory_patronymic_uid_idx ON directory (patronymic, uid);",
+        "CREATE INDEX IF NOT EXISTS directory_city_uid_idx ON directory (city, uid);",
+        "CREATE INDEX IF NOT EXISTS directory_street_uid_idx ON directory (street, uid);",
+        "CREATE INDEX IF NOT EXISTS directory_house_uid_idx ON directory (house, uid);",
+        "CREATE INDEX IF NOT EXISTS directory_telephone_uid_idx ON directory (telephone, uid);",
+        "DROP INDEX IF EXISTS directory_surname_idx;",
+        "DROP INDEX IF EXISTS directory_name_idx;",
+        "DROP INDEX IF EXISTS directory_patronymic_idx;",
+    ]),
+    ('0004_change_notifications', [
+        NOTIFY_FUNCTION,
+        *notify_trigger_steps('directory', ('INSERT', 'UPDATE', 'DELETE')),
+        *[step for table in NAME_DICTIONARIES for step in notify_trigger_steps(table, ('UPDATE',))],
+    ]),
+    ('0005_normalized_telephones', [
+        "ALTER TABLE directory ADD COLUMN IF NOT EXISTS telephone_digits TEXT;",
+        "ALTER TABLE directory ADD COLUMN IF NOT EXISTS telephone_reversed TEXT;",
+        f"""
+        UPDATE directory
+        SET telephone_digits = n.digits, telephone_reversed = reverse(n.digits)
+        FROM (SELECT uid, {normalized_phone_sql('telephone')} AS digits FROM directory) n
+        WHERE directory.uid = n.uid AND directory.telephone_digits IS DISTINCT FROM n.digits;
+        """,
+        "CREATE INDEX IF NOT EXISTS directory_telephone_digits_idx ON directory (telephone_digits text_pattern_ops);",
+        "CREATE INDEX IF NOT EXISTS directory_telephone_reversed_idx "
+        "ON directory (telephone_reversed text_pattern_ops);",
+        "ANALYZE directory;",
+    ]),
+    ('0006_city_street_dictionaries', [
+        *[step for table, column in PLACE_DICTIONARIES.items() for step in place_dictionary_steps(table, column)],
+        BatchedUpdate("""
+            UPDATE directory d
+            SET city_uid = c.uid, street_uid = s.uid
+            FROM cities c, streets s
+            WHERE d.city = c.value AND d.street = s.value
+              AND d.uid >= %(low)s AND d.uid < %(high)s
+              AND (d.city_uid IS NULL OR d.street_uid IS NULL);
+        """),
+        *[step for column in PLACE_DICTIONARIES.values() for step in place_check_steps(column)],
+        *[
+            OutsideTransaction(f"ALTER TABLE directory VALIDATE CONSTRAINT directory_{column}_uid_not_null;")
+            for column in PLACE_DICTIONARIES.values()
+        ],
+        *[step for column in PLACE_DICTIONARIES.values() for step in place_swap_steps(column)],
+        *[step for table in PLACE_DICTIONARIES for step in notify_trigger_steps(table, ('UPDATE',))],
+    ]),
+    ('0007_city_street_uid_indexes', [
+        *[drop_invalid_index_step(f"directory_{column}_uid_idx") for column in PLACE_DICTIONARIES.values()],
+        *[
+            OutsideTransaction(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS directory_{column}_uid_idx ON directory ({column}, uid);"
+            )
+            for column in PLACE_DICTIONARIES.values()
+        ],
+        "ANALYZE cities;",
+        "ANALYZE streets;",
+        "ANALYZE directory;",
+    ]),
+    ('0008_dictionary_prefix_indexes', [
+        f"CREATE INDEX IF NOT EXISTS {table}_value_prefix_idx ON {table} (lower(value) text_pattern_ops);"
+        for table in (*NAME_DICTIONARIES, *PLACE_DICTIONARIES)
+    ]),
+    ('0009_change_log', [
+        """
+        CREATE TABLE IF NOT EXISTS directory_changes (
+            id BIGSERIAL PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            uid INTEGER NOT NULL,
+            changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+        """,
+        CHANGE_LOG_FUNCTION,
+        *change_log_trigger_steps('directory', ('INSERT', 'UPDATE', 'DELETE')),
+        *[
+            step for table in (*NAME_DICTIONARIES, *PLACE_DICTIONARIES)
+            for step in change_log_trigger_steps(table, ('UPDATE',))
+        ],
+    ]),
+    ('0010_trigram_search_indexes', [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
+        *[
+            f"CREATE INDEX IF NOT EXISTS {table}_value_trgm_idx ON {table} USING gin (value gin_trgm_ops);"
+            for table in (*NAME_DICTIONARIES, *PLACE_DICTIONARIES)
+        ],
+        "CREATE INDEX IF NOT EXISTS directory_house_trgm_idx ON directory USING gin ((house::text) gin_trgm_ops);",
+        "CREATE INDEX IF NOT EXISTS directory_telephone_trgm_idx ON directory USING gin (telephone gin_trgm_ops);",
+    ]),
+    ('0011_telephone_digits_trigger', [
+        TELEPHONE_DIGITS_FUNCTION,
+        "DROP TRIGGER IF EXISTS directory_normalize_telephone ON directory;",
+        """
+        CREATE TRIGGER directory_normalize_telephone
+        BEFORE INSERT OR UPDATE OF telephone, telephone_digits, telephone_reversed ON directory
+        FOR EACH ROW EXECUTE FUNCTION normalize_directory_telephone();
+        """,
+        BatchedUpdate(f"""
+            UPDATE directory SET telephone = telephone
+            WHERE uid >= %(low)s AND uid < %(high)s
+              AND telephone_digits IS DISTINCT FROM {normalized_phone_sql('telephone')};
+        """),
+    ]),
+    ('0012_change_log_xids', [
+        "ALTER TABLE directory_changes ADD COLUMN IF NOT EXISTS xid xid8 NOT NULL DEFAULT '0';",
+        "ALTER TABLE directory_changes ALTER COLUMN xid SET DEFAULT pg_current_xact_id();",
+        "CREATE INDEX IF NOT EXISTS directory_changes_xid_idx ON directory_changes (xid);",
+        "CREATE INDEX IF NOT EXISTS directory_changes_changed_at_idx ON directory_changes (changed_at);",
+    ]),
+    ('0013_dictionary_delete_notifications', [
+        NOTIFY_FUNCTION,
+        *[
+            step for table in (*NAME_DICTIONARIES, *PLACE_DICTIONARIES)
+            for step in notify_trigger_steps(table, ('DELETE',))
+        ],
+    ]),
+    ('0014_change_log_pruning', [
+        CHANGE_LOG_PRUNING_FUNCTION,
+    ]),
+]
+OPTIONAL_MIGRATIONS = {'0010_trigram_search_indexes'}
+
+
+def applied_migrations(db):
+    db.execute_query("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            name TEXT PRIMARY KEY,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+    return {row[0] for row in db.fetch_all("SELECT name FROM schema_migrations;")}
+
+
+def step_groups(steps):
+    group = []
+    for step in steps:
+        if isinstance(step, STANDALONE_STEPS):
+            if group:
+                yield group
+                group = []
+            yield step
+        else:
+            group.append(step)
+    yield group
+
+
+def apply_migration(db, name, steps):
+    groups = list(step_groups(steps))
+    for group in groups:
+        if isinstance(group, STANDALONE_STEPS):
+            group.run(db)
+            continue
+        with db.transaction() as cursor:
+            for step in group:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            if group is groups[-1]:
+                cursor.execute("INSERT INTO schema_migrations (name) VALUES (%s);", (name,))
+
+
+def apply_migrations(db):
+    applied = applied_migrations(db)
+    for name, steps in MIGRATIONS:
+        if name in applied:
+            continue
+        try:
+            apply_migration(db, name, steps)
+        except psycopg2.Error as e:
+            if name not in OPTIONAL_MIGRATIONS:
+                raise
+            logger.warning(f"Optional migration {name} skipped: {e}")
+            continue
+        logger.debug(f"Migration {name} applied")
+
+
+def main():
+    from database import Database
+    from instrumentation import configure_logging
+    configure_logging(logging.INFO)
+    db = Database()
+    try:
+        apply_migrations(db)
+    except psycopg2.Error as e:
+        logger.error(f"Error {e} while applying migrations")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
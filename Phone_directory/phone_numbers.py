@@ -0,0 +1,60 @@
+import re
+
+
+PHONE_QUERY = re.compile(r'^\+?[\d\s().\-]+$')
+NON_DIGITS = re.compile(r'\D')
+MIN_QUERY_DIGITS = 3
+NATIONAL_DIGITS = 10
+COUNTRY_CODE = '7'
+TRUNK_PREFIX = '8'
+
+
+def digits_only(text):
+    return NON_DIGITS.sub('', str(text))
+
+
+def normalize_phone(text):
+    digits = digits_only(text)
+    if len(digits) == NATIONAL_DIGITS + 1 and digits.startswith(TRUNK_PREFIX):
+        return COUNTRY_CODE + digits[1:]
+    if len(digits) == NATIONAL_DIGITS:
+        return COUNTRY_CODE + digits
+    return digits
+
+
+def normalized_phone_sql(column):
+    digits = f"regexp_replace({column}, '\\D', '', 'g')"
+    return (
+        f"CASE WHEN length({digits}) = {NATIONAL_DIGITS + 1} AND left({digits}, 1) = '{TRUNK_PREFIX}' "
+        f"THEN '{COUNTRY_CODE}' || substr({digits}, 2) "
+        f"WHEN length({digits}) = {NATIONAL_DIGITS} THEN '{COUNTRY_CODE}' || {digits} "
+        f"ELSE {digits} END"
+    )
+
+
+def is_phone_query(text):
+    return bool(PHONE_QUERY.match(text)) and len(digits_only(text)) >= MIN_QUERY_DIGITS
+
+
+def phone_prefixes(text):
+    digits = digits_only(text)
+    prefixes = [digits]
+    if digits.startswith(TRUNK_PREFIX):
+        prefixes.append(COUNTRY_CODE + digits[1:])
+    elif not digits.startswith(COUNTRY_CODE):
+        prefixes.append(COUNTRY_CODE + digits)
+    return prefixes
+
+
+def phone_condition(text, prefix=''):
+    digits = digits_only(text)
+    prefixes = phone_prefixes(text)
+    branches = [f"{prefix}telephone_digits LIKE %s"] * len(prefixes) + [f"{prefix}telephone_reversed LIKE %s"]
+    params = [f"{value}%" for value in prefixes] + [f"{digits[::-1]}%"]
+    return "(" + " OR ".join(branches) + ")", params
+
+
+def phone_matcher(text):
+    digits = digits_only(text)
+    prefixes = tuple(phone_prefixes(text))
+    return lambda normalized: normalized.startswith(prefixes) or normalized.endswith(digits)
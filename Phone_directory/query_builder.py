@@ -0,0 +1,144 @@
+import hashlib
+
+from phone_numbers import is_phone_query, phone_condition
+
+
+BASE_QUERY = """
+    SELECT d.uid, s.value AS surname, n.value AS name, p.value AS patronymic,
+           c.value AS city, st.value AS street, d.house, d.telephone
+    FROM directory d
+    JOIN surnames s ON d.surname = s.uid
+    JOIN names n ON d.name = n.uid
+    JOIN patronymics p ON d.patronymic = p.uid
+    JOIN cities c ON d.city = c.uid
+    JOIN streets st ON d.street = st.uid
+"""
+
+DICTIONARY_FIELDS = {
+    'Фамилия': ('surnames', 'surname'),
+    'Имя': ('names', 'name'),
+    'Отчество': ('patronymics', 'patronymic'),
+    'Город': ('cities', 'city'),
+    'Улица': ('streets', 'street'),
+}
+
+DIRECTORY_FIELDS = {
+    'ID': 'uid::text',
+    'Дом': 'house::text',
+    'Телефон': 'telephone',
+}
+
+SORT_KEYS = ['d.uid', 's.value', 'n.value', 'p.value', 'c.value', 'st.value', 'd.house', 'd.telephone']
+
+PAGE_SIZE = 500
+
+SEARCH_FIELDS = ['Фамилия', 'Имя', 'Отчество', 'Город', 'Улица', 'Дом', 'Телефон']
+
+FILTER_FIELDS = ['ID'] + SEARCH_FIELDS
+
+
+def escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def like_pattern(text):
+    return f'%{escape_like(text)}%'
+
+
+def prefix_pattern(text):
+    return f'{escape_like(text)}%'
+
+
+def dictionary_condition(table, column):
+    return f"d.{column} IN (SELECT uid FROM {table} WHERE value ILIKE %s)"
+
+
+def search_condition(search_term):
+    branches = []
+    params = []
+    for header in SEARCH_FIELDS:
+        if header == 'Телефон' and is_phone_query(search_term):
+            predicate, phone_params = phone_condition(search_term)
+            params.extend(phone_params)
+        elif header in DICTIONARY_FIELDS:
+            table, column = DICTIONARY_FIELDS[header]
+            predicate = f"{column} IN (SELECT uid FROM {table} WHERE value ILIKE %s)"
+            params.append(like_pattern(search_term))
+        else:
+            predicate = f"{DIRECTORY_FIELDS[header]} ILIKE %s"
+            params.append(like_pattern(search_term))
+        branches.append(f"SELECT uid FROM directory WHERE {predicate}")
+    return "d.uid IN (\n        " + "\n        UNION ".join(branches) + "\n    )", params
+
+
+def keyset_condition(sort_key, descending, after):
+    comparison = '<' if descending else '>'
+    last_value, last_uid = after
+    if sort_key == 'd.uid':
+        return f"d.uid {comparison} %s", [last_uid]
+    return (
+        f"{sort_key} {comparison}= %s AND ({sort_key}, d.uid) {comparison} (%s, %s)",
+        [last_value, last_value, last_uid],
+    )
+
+
+def order_clause(sort_key, descending):
+    direction = 'DESC' if descending else 'ASC'
+    if sort_key == 'd.uid':
+        return f" ORDER BY d.uid {direction}"
+    return f" ORDER BY {sort_key} {direction}, d.uid {direction}"
+
+
+def build_filter_query(search_term='', filters=None, sort_column=None, descending=False, after=None, limit=None,
+                       uids=None):
+    conditions = []
+    params = []
+
+    if search_term:
+        condition, search_params = search_condition(search_term)
+        conditions.append(condition)
+        params.extend(search_params)
+
+    filters = filters or {}
+    for header in FILTER_FIELDS:
+        if header not in filters:
+            continue
+        if header == 'Телефон' and is_phone_query(filters[header]):
+            condition, phone_params = phone_condition(filters[header], 'd.')
+            conditions.append(condition)
+            params.extend(phone_params)
+            continue
+        if header in DICTIONARY_FIELDS:
+            conditions.append(dictionary_condition(*DICTIONARY_FIELDS[header]))
+        else:
+            conditions.append(f"d.{DIRECTORY_FIELDS[header]} ILIKE %s")
+        params.append(like_pattern(filters[header]))
+
+    if uids is not None:
+        conditions.append("d.uid = ANY(%s)")
+        params.append(list(uids))
+
+    if sort_column is not None and after is not None:
+        condition, keyset_params = keyset_condition(SORT_KEYS[sort_column], descending, after)
+        conditions.append(condition)
+        params.extend(keyset_params)
+
+    if conditions:
+        where_clause = " WHERE " + " AND ".join(conditions)
+    else:
+        where_clause = ""
+
+    query = BASE_QUERY + where_clause
+    if sort_column is not None:
+        query += order_clause(SORT_KEYS[sort_column], descending)
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, params
+
+
+def query_shape(query):
+    parts = query.split('%s')
+    text = parts[0] + ''.join(f"${number}{part}" for number, part in enumerate(parts[1:], 1))
+    name = f"filter_{hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]}"
+    return name, text, len(parts) - 1
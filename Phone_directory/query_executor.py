@@ -0,0 +1,134 @@
+import logging
+from collections import OrderedDict
+import psycopg2
+from psycopg2 import errors
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from query_builder import query_shape
+
+
+logger = logging.getLogger(__name__)
+
+MAX_PREPARED_STATEMENTS = 128
+
+
+class PreparedStatements:
+    def __init__(self, max_size=MAX_PREPARED_STATEMENTS):
+        self.max_size = max_size
+        self.prepared = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def reset(self):
+        self.prepared.clear()
+
+    def execute(self, cursor, query, params=None):
+        name, text, count = query_shape(query)
+        if name in self.prepared:
+            self.prepared.move_to_end(name)
+            self.hits += 1
+        else:
+            self.misses += 1
+            cursor.execute(f"PREPARE {name} AS {text}")
+            self.prepared[name] = text
+            logger.debug(f"Prepared {name} with {count} parameters")
+            while len(self.prepared) > self.max_size:
+                stale, _ = self.prepared.popitem(last=False)
+                cursor.execute(f"DEALLOCATE {stale}")
+        if count:
+            cursor.execute_prepared(text, f"EXECUTE {name} ({', '.join(['%s'] * count)})", params)
+        else:
+            cursor.execute_prepared(text, f"EXECUTE {name}")
+
+    def snapshot(self):
+        return {'shapes': len(self.prepared), 'hits': self.hits, 'misses': self.misses}
+
+
+class QueryTask(QRunnable):
+    def __init__(self, executor, generation, query, params):
+        super().__init__()
+        self.executor = executor
+        self.generation = generation
+        self.query = query
+        self.params = params
+
+    def run(self):
+        self.executor.run_task(self.generation, self.query, self.params)
+
+
+class QueryExecutor(QObject):
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+
+    def __init__(self, connect, statement_timeout=30000, parent=None):
+        super().__init__(parent)
+        self.connect = connect
+        self.statement_timeout = statement_timeout
+        self.generation = 0
+        self.running = None
+        self.conn = None
+        self.statements = PreparedStatements()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+    def submit(self, query, params=None):
+        self.generation += 1
+        self.pool.clear()
+        self.cancel_running()
+        self.pool.start(QueryTask(self, self.generation, query, params))
+        return self.generation
+
+    def cancel(self):
+        self.generation += 1
+        self.pool.clear()
+        self.cancel_running()
+
+    def is_current(self, generation):
+        return generation == self.generation
+
+    def cancel_running(self):
+        if self.running is not None and self.conn is not None and not self.conn.closed:
+            try:
+                self.conn.cancel()
+                logger.debug(f"Cancelled stale query #{self.running}")
+            except psycopg2.Error as e:
+                logger.error(f"Error {e} while cancelling the query")
+
+    def ensure_connection(self):
+        if self.conn is None or self.conn.closed:
+            self.conn = self.connect(options=f"-c statement_timeout={self.statement_timeout}")
+            self.conn.autocommit = True
+            self.statements.reset()
+        return self.conn
+
+    def run_task(self, generation, query, params):
+        if not self.is_current(generation):
+            return
+        self.running = generation
+        try:
+            conn = self.ensure_connection()
+            with conn.cursor() as cursor:
+                self.statements.execute(cursor, query, params)
+                rows = cursor.fetchall()
+        except errors.QueryCanceled:
+            if self.is_current(generation):
+                self.failed.emit(generation, "Превышено время ожидания запроса")
+            return
+        except psycopg2.Error as e:
+            logger.error(f"Error {e} while request execution")
+            if self.conn is not None:
+                self.conn.close()
+            if self.is_current(generation):
+                self.failed.emit(generation, str(e))
+            return
+        finally:
+            self.running = None
+
+        if not self.is_current(generation):
+            return
+        self.finished.emit(generation, rows)
+
+    def shutdown(self):
+        self.cancel()
+        self.pool.waitForDone()
+        if self.conn is not None and not self.conn.closed:
+            self.conn.close()
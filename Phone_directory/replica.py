@@ -0,0 +1,321 @@
+import json
+import logging
+import os
+import sqlite3
+import uuid
+
+from dictionary_resolver import DICTIONARY_COLUMNS
+from phone_numbers import digits_only, is_phone_query, normalize_phone, phone_prefixes
+from query_builder import BASE_QUERY, FILTER_FIELDS, SEARCH_FIELDS, build_filter_query, like_pattern
+
+
+logger = logging.getLogger(__name__)
+
+REPLICA_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'phone_directory', 'replica.sqlite3')
+ITERSIZE = 20000
+FETCH_BATCH_SIZE = 10000
+MIN_FTS_LENGTH = 3
+
+COLUMNS = {
+    'ID': 'uid',
+    'Фамилия': 'surname',
+    'Имя': 'name',
+    'Отчество': 'patronymic',
+    'Город': 'city',
+    'Улица': 'street',
+    'Дом': 'house',
+    'Телефон': 'telephone',
+}
+SORT_COLUMNS = list(COLUMNS.values())
+SEARCH_COLUMNS = [COLUMNS[header] for header in SEARCH_FIELDS]
+FIELD_SEPARATOR = '\x1f'
+
+SCHEMA = """
+    DROP TABLE IF EXISTS directory_fts;
+    DROP TABLE IF EXISTS directory;
+    DROP TABLE IF EXISTS replica_state;
+    CREATE TABLE directory (
+        uid INTEGER PRIMARY KEY,
+        surname TEXT NOT NULL,
+        name TEXT NOT NULL,
+        patronymic TEXT NOT NULL,
+        city TEXT NOT NULL,
+        street TEXT NOT NULL,
+        house,
+        telephone TEXT NOT NULL,
+        telephone_digits TEXT NOT NULL,
+        telephone_reversed TEXT NOT NULL,
+        search_text TEXT NOT NULL
+    );
+    CREATE TABLE replica_state (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+    CREATE VIRTUAL TABLE directory_fts USING fts5(
+        surname, name, patronymic, city, street, house, telephone,
+        content='directory', content_rowid='uid', tokenize='trigram'
+    );
+"""
+
+INDEXES = """
+    CREATE INDEX directory_surname_idx ON directory (surname, uid);
+    CREATE INDEX directory_name_idx ON directory (name, uid);
+    CREATE INDEX directory_patronymic_idx ON directory (patronymic, uid);
+    CREATE INDEX directory_city_idx ON directory (city, uid);
+    CREATE INDEX directory_street_idx ON directory (street, uid);
+    CREATE INDEX directory_house_idx ON directory (house, uid);
+    CREATE INDEX directory_telephone_idx ON directory (telephone, uid);
+    CREATE INDEX directory_telephone_digits_idx ON directory (telephone_digits);
+    CREATE INDEX directory_telephone_reversed_idx ON directory (telephone_reversed);
+    CREATE TRIGGER directory_fts_insert AFTER INSERT ON directory BEGIN
+        INSERT INTO directory_fts (rowid, surname, name, patronymic, city, street, house, telephone)
+        VALUES (new.uid, new.surname, new.name, new.patronymic, new.city, new.street, new.house, new.telephone);
+    END;
+    CREATE TRIGGER directory_fts_delete AFTER DELETE ON directory BEGIN
+        INSERT INTO directory_fts (directory_fts, rowid, surname, name, patronymic, city, street, house, telephone)
+        VALUES ('delete', old.uid, old.surname, old.name, old.patronymic, old.city, old.street, old.house,
+                old.telephone);
+    END;
+    CREATE TRIGGER directory_fts_update AFTER UPDATE ON directory BEGIN
+        INSERT INTO directory_fts (directory_fts, rowid, surname, name, patronymic, city, street, house, telephone)
+        VALUES ('delete', old.uid, old.surname, old.name, old.patronymic, old.city, old.street, old.house,
+                old.telephone);
+        INSERT INTO directory_fts (rowid, surname, name, patronymic, city, street, house, telephone)
+        VALUES (new.uid, new.surname, new.name, new.patronymic, new.city, new.street, new.house, new.telephone);
+    END;
+"""
+
+INSERT_QUERY = """
+    INSERT INTO directory (
+        uid, surname, name, patronymic, city, street, house, telephone, telephone_digits, telephone_reversed,
+        search_text
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+UPSERT_QUERY = INSERT_QUERY + """
+    ON CONFLICT (uid) DO UPDATE SET
+        surname = excluded.surname, name = excluded.name, patronymic = excluded.patronymic,
+        city = excluded.city, street = excluded.street, house = excluded.house,
+        telephone = excluded.telephone, telephone_digits = excluded.telephone_digits,
+        telephone_reversed = excluded.telephone_reversed, search_text = excluded.search_text
+"""
+
+
+def replica_row(row):
+    digits = normalize_phone(row[7])
+    search_text = FIELD_SEPARATOR.join(casefold(value) or '' for value in row[1:8])
+    return tuple(row) + (digits, digits[::-1], search_text)
+
+
+def casefold(value):
+    return None if value is None else str(value).casefold()
+
+
+def fts_query(columns, text):
+    escaped = text.replace('"', '""')
+    return f'{{{" ".join(columns)}}} : "{escaped}"'
+
+
+def text_condition(columns, text):
+    if len(text) >= MIN_FTS_LENGTH:
+        return "uid IN (SELECT rowid FROM directory_fts WHERE directory_fts MATCH ?)", [fts_query(columns, text)]
+    pattern = like_pattern(text.casefold())
+    if columns == SEARCH_COLUMNS:
+        return "search_text LIKE ? ESCAPE '\\'", [pattern]
+    return (
+        "(" + " OR ".join(f"casefold({column}) LIKE ? ESCAPE '\\'" for column in columns) + ")",
+        [pattern] * len(columns),
+    )
+
+
+def phone_condition(text):
+    prefixes = phone_prefixes(text)
+    branches = ["telephone_digits GLOB ?"] * len(prefixes) + ["telephone_reversed GLOB ?"]
+    params = [f"{value}*" for value in prefixes] + [f"{digits_only(text)[::-1]}*"]
+    return "(" + " OR ".join(branches) + ")", params
+
+
+class LocalReplica:
+    def __init__(self, path=REPLICA_PATH):
+        self.path = path
+        self.reader = None
+
+    def open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        connection.create_function('casefold', 1, casefold, deterministic=True)
+        connection.execute("PRAGMA journal_mode=WAL;")
+        return connection
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+    @staticmethod
+    def state(connection):
+        try:
+            return dict(connection.execute("SELECT key, value FROM replica_state;").fetchall())
+        except sqlite3.OperationalError:
+            return {}
+
+    @staticmethod
+    def save_state(connection, last_change, snapshot_xmin):
+        connection.executemany(
+            "INSERT OR REPLACE INTO replica_state (key, value) VALUES (?, ?);",
+            (('last_change', last_change), ('snapshot_xmin', snapshot_xmin))
+        )
+
+    @staticmethod
+    def snapshot_state(cursor):
+        cursor.execute("""
+            SELECT min(id), max(id), pg_snapshot_xmin(pg_current_snapshot())::text FROM directory_changes;
+        """)
+        oldest, latest, snapshot_xmin = cursor.fetchone()
+        return oldest, latest, int(snapshot_xmin)
+
+    def sync(self, db, report=None):
+        connection = self.open()
+        try:
+            state = self.state(connection)
+            if 'last_change' not in state or 'snapshot_xmin' not in state:
+                self.full_sync(connection, db, report)
+                return None
+            uids = self.incremental_sync(connection, db, state['last_change'], state['snapshot_xmin'])
+            if uids is None:
+                self.full_sync(connection, db, report)
+            return uids
+        finally:
+            connection.close()
+
+    def full_sync(self, connection, db, report=None):
+        with db.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY;")
+                _, latest, snapshot_xmin = self.snapshot_state(cursor)
+                cursor.execute("SELECT count(*) FROM directory;")
+                total = cursor.fetchone()[0]
+
+            connection.executescript(SCHEMA)
+            loaded = 0
+            with conn.cursor(name=f"replica_{uuid.uuid4().hex}") as cursor:
+                cursor.itersize = ITERSIZE
+                cursor.execute(BASE_QUERY)
+                while True:
+                    rows = cursor.fetchmany(ITERSIZE)
+                    if not rows:
+                        break
+                    connection.executemany(INSERT_QUERY, map(replica_row, rows))
+                    loaded += len(rows)
+                    if report:
+                        report(loaded * 90 // max(total, 1), f"Загружено {loaded} из {total} записей")
+
+        if report:
+            report(90, "Построение индексов")
+        connection.execute("INSERT INTO directory_fts (directory_fts) VALUES ('rebuild');")
+        connection.executescript(INDEXES)
+        self.save_state(connection, latest or 0, snapshot_xmin)
+        connection.commit()
+        logger.debug(f"Loaded {loaded} rows into the local replica")
+
+    def incremental_sync(self, connection, db, last_change, snapshot_xmin):
+        with db.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY;")
+            oldest, latest, next_xmin = self.snapshot_state(cursor)
+            if latest is None:
+                covered = not last_change
+            else:
+                covered = oldest <= last_change + 1 and latest >= last_change
+            if not covered:
+                logger.info(f"Change log no longer covers change {last_change}, reloading the local replica")
+                return None
+            cursor.execute(
+                "SELECT DISTINCT table_name, uid FROM directory_changes WHERE xid >= %s::xid8;", (str(snapshot_xmin),)
+            )
+            changes = cursor.fetchall()
+
+            uids = set()
+            referenced = {}
+            for table, uid in changes:
+                if table == 'directory':
+                    uids.add(uid)
+                elif table in DICTIONARY_COLUMNS:
+                    referenced.setdefault(table, set()).add(uid)
+            for table, table_uids in referenced.items():
+                cursor.execute(
+                    f"SELECT uid FROM directory WHERE {DICTIONARY_COLUMNS[table]} = ANY(%s);", (list(table_uids),)
+                )
+                uids.update(row[0] for row in cursor.fetchall())
+
+            uids = sorted(uids)
+            for start in range(0, len(uids), FETCH_BATCH_SIZE):
+                batch = uids[start:start + FETCH_BATCH_SIZE]
+                cursor.execute(*build_filter_query(uids=batch))
+                rows = cursor.fetchall()
+                connection.executemany(UPSERT_QUERY, map(replica_row, rows))
+                missing = set(batch).difference(row[0] for row in rows)
+                connection.executemany("DELETE FROM directory WHERE uid = ?;", ((uid,) for uid in missing))
+        self.save_state(connection, latest or 0, next_xmin)
+        connection.commit()
+        logger.debug(f"Synchronized {len(uids)} rows from {len(changes)} changes into the local replica")
+        return uids
+
+    def search(self, search_term='', filters=None, sort_column=None, descending=False, after=None, limit=None,
+               uids=None):
+        if self.reader is None:
+            self.reader = self.open()
+        conditions = []
+        params = []
+
+        if search_term:
+            columns = list(SEARCH_COLUMNS)
+            branches = []
+            if is_phone_query(search_term):
+                columns.remove('telephone')
+                condition, phone_params = phone_condition(search_term)
+                branches.append(condition)
+                params.extend(phone_params)
+            condition, text_params = text_condition(columns, search_term.casefold())
+            branches.append(condition)
+            params.extend(text_params)
+            conditions.append("(" + " OR ".join(branches) + ")")
+
+        filters = filters or {}
+        for header in FILTER_FIELDS:
+            if header not in filters:
+                continue
+            value = filters[header]
+            if header == 'Телефон' and is_phone_query(value):
+                condition, filter_params = phone_condition(value)
+            elif header == 'ID':
+                condition, filter_params = "CAST(uid AS TEXT) LIKE ? ESCAPE '\\'", [like_pattern(value)]
+            else:
+                condition, filter_params = text_condition([COLUMNS[header]], value.casefold())
+            conditions.append(condition)
+            params.extend(filter_params)
+
+        if uids is not None:
+            conditions.append("uid IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(list(uids)))
+
+        comparison = '<' if descending else '>'
+        sort_key = None if sort_column is None else SORT_COLUMNS[sort_column]
+        if sort_key is not None and after is not None:
+            last_value, last_uid = after
+            if sort_key == 'uid':
+                conditions.append(f"uid {comparison} ?")
+                params.append(last_uid)
+            else:
+                conditions.append(f"({sort_key}, uid) {comparison} (?, ?)")
+                params.extend([last_value, last_uid])
+
+        query = "SELECT uid, surname, name, patronymic, city, street, house, telephone FROM directory"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        direction = 'DESC' if descending else 'ASC'
+        if sort_key == 'uid':
+            query += f" ORDER BY uid {direction}"
+        elif sort_key is not None:
+            query += f" ORDER BY {sort_key} {direction}, uid {direction}"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return self.reader.execute(query, params).fetchall()
@@ -0,0 +1,83 @@
+import logging
+from collections import OrderedDict
+
+from memory_index import MemoryDirectory
+from phone_numbers import is_phone_query
+from row_store import RowStore
+
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHE_BYTES = 32 * 1024 * 1024
+
+
+def normalize(search_term, filters):
+    return search_term.casefold(), tuple(sorted((header, value.casefold()) for header, value in filters.items()))
+
+
+def narrows(cached_value, value):
+    if is_phone_query(cached_value) or is_phone_query(value):
+        return cached_value == value
+    return cached_value in value
+
+
+def refines(key, cached_key):
+    term, filters = key
+    cached_term, cached_filters = cached_key
+    if cached_term and not narrows(cached_term, term):
+        return False
+    current = dict(filters)
+    return all(header in current and narrows(value, current[header]) for header, value in cached_filters)
+
+
+class ResultCache:
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.refinements = 0
+        self.misses = 0
+
+    def lookup(self, search_term, filters, sort_column, descending):
+        key = normalize(search_term, filters)
+        order = (sort_column, descending)
+        entry = self.entries.get((key, order))
+        if entry is not None:
+            self.entries.move_to_end((key, order))
+            self.hits += 1
+            return entry[0]
+
+        candidates = [
+            rows for (cached_key, cached_order), (rows, _) in self.entries.items()
+            if cached_order == order and refines(key, cached_key)
+        ]
+        if not candidates:
+            self.misses += 1
+            return None
+        rows = [row for row in min(candidates, key=len) if MemoryDirectory.matches(row, search_term, filters)]
+        self.refinements += 1
+        logger.debug(f"Refined a cached result to {len(rows)} rows locally")
+        self.store(search_term, filters, sort_column, descending, rows)
+        return rows
+
+    def store(self, search_term, filters, sort_column, descending, rows):
+        key = (normalize(search_term, filters), (sort_column, descending))
+        rows = RowStore(rows)
+        size = rows.nbytes()
+        if size > self.max_bytes:
+            return
+        self.discard(key)
+        while self.entries and self.size + size > self.max_bytes:
+            self.discard(next(iter(self.entries)))
+        self.entries[key] = (rows, size)
+        self.size += size
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
@@ -0,0 +1,102 @@
+import array
+import sys
+
+
+ENCODED_COLUMNS = (1, 2, 3, 4, 5, 6)
+INTEGER_COLUMNS = (0,)
+TEXT_COLUMNS = (7,)
+COLUMN_COUNT = 8
+
+
+class ValueTable:
+    __slots__ = ('codes', 'values')
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            value = sys.intern(value) if isinstance(value, str) else value
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.values)
+
+
+class RowStore:
+    __slots__ = ('columns', 'values')
+
+    def __init__(self, rows=()):
+        self.values = {column: ValueTable() for column in ENCODED_COLUMNS}
+        self.columns = {}
+        for column in INTEGER_COLUMNS:
+            self.columns[column] = array.array('q')
+        for column in ENCODED_COLUMNS:
+            self.columns[column] = array.array('I')
+        for column in TEXT_COLUMNS:
+            self.columns[column] = []
+        self.extend(rows)
+
+    def encode(self, column, value):
+        if column in ENCODED_COLUMNS:
+            return self.values[column].encode(value)
+        return value
+
+    def decode(self, column, stored):
+        if column in ENCODED_COLUMNS:
+            return self.values[column].values[stored]
+        return stored
+
+    def value(self, position, column):
+        return self.decode(column, self.columns[column][position])
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[index] for index in range(*position.indices(len(self)))]
+        return tuple(self.decode(column, self.columns[column][position]) for column in range(COLUMN_COUNT))
+
+    def __setitem__(self, position, row):
+        for column in range(COLUMN_COUNT):
+            self.columns[column][position] = self.encode(column, row[column])
+
+    def __delitem__(self, position):
+        for values in self.columns.values():
+            del values[position]
+
+    def insert(self, position, row):
+        for column in range(COLUMN_COUNT):
+            self.columns[column].insert(position, self.encode(column, row[column]))
+
+    def append(self, row):
+        for column in range(COLUMN_COUNT):
+            self.columns[column].append(self.encode(column, row[column]))
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def column(self, column):
+        if column in ENCODED_COLUMNS:
+            return [self.values[column].values[stored] for stored in self.columns[column]]
+        return list(self.columns[column])
+
+    def uids(self):
+        return self.columns[0].tolist()
+
+    def nbytes(self):
+        size = sys.getsizeof(self.columns)
+        for table in self.values.values():
+            size += sys.getsizeof(table.codes) + sys.getsizeof(table.values)
+        for column, values in self.columns.items():
+            size += sys.getsizeof(values)
+            if column in TEXT_COLUMNS:
+                size += sum(map(sys.getsizeof, values))
+        return size
@@ -0,0 +1,118 @@
+import array
+import json
+import logging
+import mmap
+import os
+import struct
+
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'phone_directory', 'first_page.snapshot')
+MAGIC = b'PDSNAP01'
+HEADER = struct.Struct('<8sII')
+INTEGER_COLUMNS = (0, 6)
+HOUSE_COLUMN = 6
+COLUMN_COUNT = 8
+
+
+class SnapshotRows:
+    def __init__(self, buffer, count, columns, integer_columns=INTEGER_COLUMNS):
+        self.buffer = buffer
+        self.count = count
+        self.columns = columns
+        self.integer_columns = integer_columns
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return tuple(self.value(column, index) for column in range(COLUMN_COUNT))
+
+    def value(self, column, index):
+        if column in self.integer_columns:
+            return self.columns[column][index]
+        offsets, start = self.columns[column]
+        return str(self.buffer[start + offsets[index]:start + offsets[index + 1]], 'utf-8')
+
+
+def integer_columns(rows):
+    if all(isinstance(row[HOUSE_COLUMN], int) for row in rows):
+        return INTEGER_COLUMNS
+    return tuple(column for column in INTEGER_COLUMNS if column != HOUSE_COLUMN)
+
+
+def write_snapshot(rows, search_term='', filters=None, sort_column=0, descending=False, path=SNAPSHOT_PATH):
+    integers = integer_columns(rows)
+    meta = json.dumps({
+        'search_term': search_term,
+        'filters': filters or {},
+        'sort_column': sort_column,
+        'descending': descending,
+        'integer_columns': integers,
+    }, ensure_ascii=False).encode('utf-8')
+    chunks = [HEADER.pack(MAGIC, len(rows), len(meta)), meta]
+    for column in range(COLUMN_COUNT):
+        if column in integers:
+            chunks.append(array.array('q', (row[column] for row in rows)).tobytes())
+            continue
+        encoded = [str(row[column]).encode('utf-8') for row in rows]
+        offsets = array.array('I', [0])
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        chunks.append(offsets.tobytes())
+        chunks.extend(encoded)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as stream:
+        stream.writelines(chunks)
+    os.replace(temporary, path)
+    logger.debug(f"Saved a snapshot of {len(rows)} rows to {path}")
+
+
+def read_snapshot(path=SNAPSHOT_PATH):
+    try:
+        with open(path, 'rb') as stream:
+            buffer = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        return parse_snapshot(buffer)
+    except (struct.error, ValueError, IndexError) as e:
+        logger.error(f"Error {e} while reading the snapshot {path}")
+        return None
+
+
+def parse_snapshot(buffer):
+    magic, count, meta_length = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError("unknown snapshot format")
+    position = HEADER.size
+    meta = json.loads(str(buffer[position:position + meta_length], 'utf-8'))
+    position += meta_length
+    integers = tuple(meta.get('integer_columns', INTEGER_COLUMNS))
+
+    columns = []
+    for column in range(COLUMN_COUNT):
+        if column in integers:
+            values = array.array('q')
+            values.frombytes(buffer[position:position + count * values.itemsize])
+            position += count * values.itemsize
+            columns.append(values)
+            continue
+        offsets = array.array('I')
+        offsets.frombytes(buffer[position:position + (count + 1) * offsets.itemsize])
+        position += (count + 1) * offsets.itemsize
+        columns.append((offsets, position))
+        position += offsets[-1]
+    if position > len(buffer):
+        raise ValueError("truncated snapshot")
+    return SnapshotRows(buffer, count, columns, integers), meta
@@ -1,13 +1,18 @@
+import logging
 from PyQt5.QtWidgets import (
     QDialog, QFormLayout, QLineEdit, QPushButton, QMessageBox, QVBoxLayout, QHBoxLayout
 )
-from psycopg2 import sql
+from value_completer import ValueCompleter
+
+
+logger = logging.getLogger(__name__)
 
 
 class UtilsDialog(QDialog):
-    def __init__(self, db):
+    def __init__(self, db, completions=None):
         super().__init__()
         self.db = db
+        self.changed_uids = []
         self.setWindowTitle("Утилиты")
         self.resize(400, 400)
 
@@ -36,6 +41,15 @@ class UtilsDialog(QDialog):
 
         self.layout.addLayout(self.form_layout)
 
+        if completions is not None:
+            self.completers = [
+                ValueCompleter(completions, 'surnames', self.surname_input),
+                ValueCompleter(completions, 'names', self.name_input),
+                ValueCompleter(completions, 'patronymics', self.patronymic_input),
+                ValueCompleter(completions, 'cities', self.city_input),
+                ValueCompleter(completions, 'streets', self.street_input),
+            ]
+
         self.buttons_layout = QHBoxLayout()
 
         self.add_button = QPushButton("Добавить", self)
@@ -64,34 +78,31 @@ class UtilsDialog(QDialog):
 
         if not all([surname, name, patronymic, city, street, house, telephone]):
             QMessageBox.warning(self, "Ошибка", "Пожалуйста, заполните все поля.")
-            print("[ERROR] Not all fields are filled in")
+            logger.error("Not all fields are filled in")
             return
 
-        surname_uid = self.get_or_create_uid('surnames', surname)
-        name_uid = self.get_or_create_uid('names', name)
-        patronymic_uid = self.get_or_create_uid('patronymics', patronymic)
-
         query = """
             INSERT INTO directory (surname, name, patronymic, city, street, house, telephone)
-            VALUES (%s, %s, %s, %s, %s, %s, %s);
+            VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING uid;
         """
-        params = (surname_uid, name_uid, patronymic_uid, city, street, house, telephone)
-
         try:
-            self.db.execute_query(query, params)
+            with self.db.transaction() as cursor:
+                uids = self.resolve_uids(cursor, surname, name, patronymic, city, street)
+                cursor.execute(query, uids + (house, telephone))
+                self.changed_uids = [cursor.fetchone()[0]]
             QMessageBox.information(self, "Успех", "Запись успешно добавлена!")
-            print("[DEBUG] The entry was successfully added")
+            logger.debug("The entry was successfully added")
             self.clear_fields()
             self.accept()
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось добавить запись:\n{e}")
-            print("[ERROR] Failed to add an entry")
+            logger.error("Failed to add an entry")
 
     def update_record(self):
         uid = self.id_input.text().strip()
         if not uid:
             QMessageBox.warning(self, "Ошибка", "Пожалуйста, введите ID для обновления.")
-            print("[ERROR] The update id has not been entered")
+            logger.error("The update id has not been entered")
             return
 
         surname = self.surname_input.text().strip()
@@ -104,13 +115,9 @@ class UtilsDialog(QDialog):
 
         if not all([surname, name, patronymic, city, street, house, telephone]):
             QMessageBox.warning(self, "Ошибка", "Пожалуйста, заполните все поля.")
-            print("[ERROR] Not all fields are filled in")
+            logger.error("Not all fields are filled in")
             return
 
-        surname_uid = self.get_or_create_uid('surnames', surname)
-        name_uid = self.get_or_create_uid('names', name)
-        patronymic_uid = self.get_or_create_uid('patronymics', patronymic)
-
         query = """
             UPDATE directory
             SET surname = %s,
@@ -122,23 +129,24 @@ class UtilsDialog(QDialog):
                 telephone = %s
             WHERE uid = %s;
         """
-        params = (surname_uid, name_uid, patronymic_uid, city, street, house, telephone, uid)
-
         try:
-            self.db.execute_query(query, params)
+            with self.db.transaction() as cursor:
+                uids = self.resolve_uids(cursor, surname, name, patronymic, city, street)
+                cursor.execute(query, uids + (house, telephone, uid))
+            self.changed_uids = [int(uid)]
             QMessageBox.information(self, "Успех", "Запись успешно обновлена!")
-            print("[DEBUG] The entry was successfully updated")
+            logger.debug("The entry was successfully updated")
             self.clear_fields()
             self.accept()
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось обновить запись:\n{e}")
-            print("[ERROR] Failed to update an entry")
+            logger.error("Failed to update an entry")
 
     def delete_record(self):
         uid = self.id_input.text().strip()
         if not uid:
             QMessageBox.warning(self, "Ошибка", "Пожалуйста, введите ID для удаления.")
-            print("[ERROR] The delete id has not been entered")
+            logger.error("The delete id has not been entered")
             return
 
         confirm = QMessageBox.question(
@@ -152,29 +160,24 @@ class UtilsDialog(QDialog):
             query = "DELETE FROM directory WHERE uid = %s;"
             try:
                 self.db.execute_query(query, (uid,))
+                self.changed_uids = [int(uid)]
                 QMessageBox.information(self, "Успех", "Запись успешно удалена!")
-                print("[DEBUG] The entry was successfully deleted")
+                logger.debug("The entry was successfully deleted")
                 self.clear_fields()
                 self.accept()
             except Exception as e:
                 QMessageBox.critical(self, "Ошибка", f"Не удалось удалить запись:\n{e}")
-                print("[ERROR] Failed to delete an entry")
-
-    def get_or_create_uid(self, table, value):
-        select_query = sql.SQL("SELECT uid FROM {table} WHERE value = %s;").format(
-            table=sql.Identifier(table)
-        )
-        self.db.cursor.execute(select_query, (value,))
-        result = self.db.cursor.fetchone()
-        if result:
-            return result[0]
-        else:
-            insert_query = sql.SQL("INSERT INTO {table} (value) VALUES (%s) RETURNING uid;").format(
-                table=sql.Identifier(table)
-            )
-            self.db.cursor.execute(insert_query, (value,))
-            self.db.conn.commit()
-            return self.db.cursor.fetchone()[0]
+                logger.error("Failed to delete an entry")
+
+    def resolve_uids(self, cursor, surname, name, patronymic, city, street):
+        uids = self.db.dictionaries.resolve(cursor, {
+            'surnames': surname,
+            'names': name,
+            'patronymics': patronymic,
+            'cities': city,
+            'streets': street,
+        })
+        return uids['surnames'], uids['names'], uids['patronymics'], uids['cities'], uids['streets']
 
     def clear_fields(self):
         self.id_input.clear()
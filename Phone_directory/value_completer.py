@@ -0,0 +1,103 @@
+import logging
+from PyQt5.QtCore import Qt, QStringListModel
+from PyQt5.QtWidgets import QCompleter
+from psycopg2 import sql
+
+from dictionary_resolver import DICTIONARY_COLUMNS
+
+
+logger = logging.getLogger(__name__)
+
+MAX_SUGGESTIONS = 20
+
+
+class SortedValues:
+    def __init__(self):
+        self.values = []
+        self.max_uid = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def position(self, key):
+        low, high = 0, len(self.values)
+        while low < high:
+            middle = (low + high) // 2
+            if self.values[middle].casefold() < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def extend(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        self.max_uid = max(self.max_uid, max(uid for uid, _ in rows))
+        self.values.extend(sorted((value for _, value in rows), key=str.casefold))
+        self.values.sort(key=str.casefold)
+
+    def suggestions(self, prefix, limit=MAX_SUGGESTIONS):
+        key = prefix.casefold()
+        start = self.position(key)
+        result = []
+        for value in self.values[start:start + limit]:
+            if not value.casefold().startswith(key):
+                break
+            result.append(value)
+        return result
+
+
+class DictionaryCompletions:
+    def __init__(self):
+        self.tables = {}
+
+    def loaded(self):
+        return len(self.tables) == len(DICTIONARY_COLUMNS)
+
+    def refresh(self, db, report=None):
+        for step, table in enumerate(DICTIONARY_COLUMNS):
+            values = self.tables.get(table)
+            if values is None:
+                values = SortedValues()
+            query = sql.SQL("SELECT uid, value FROM {table} WHERE uid > %s;").format(table=sql.Identifier(table))
+            rows = db.fetch_all(query, (values.max_uid,), raise_errors=True)
+            values.extend(rows)
+            self.tables[table] = values
+            logger.debug(f"Refreshed completions for {table}: {len(rows)} new, {len(values)} total")
+            if report:
+                report((step + 1) * 100 // len(DICTIONARY_COLUMNS), f"Загружены подсказки: {table}")
+        return self
+
+    def invalidate(self, table=None):
+        if table is None:
+            self.tables.clear()
+        else:
+            self.tables.pop(table, None)
+
+    def suggestions(self, table, prefix, limit=MAX_SUGGESTIONS):
+        values = self.tables.get(table)
+        if values is None or not prefix:
+            return []
+        return values.suggestions(prefix, limit)
+
+
+class ValueCompleter(QCompleter):
+    def __init__(self, completions, table, line_edit):
+        super().__init__(line_edit)
+        self.completions = completions
+        self.table = table
+        self.suggestion_model = QStringListModel(self)
+        self.setModel(self.suggestion_model)
+        self.setCaseSensitivity(Qt.CaseInsensitive)
+        self.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        line_edit.setCompleter(self)
+        line_edit.textEdited.connect(self.update_suggestions)
+
+    def update_suggestions(self, text):
+        suggestions = self.completions.suggestions(self.table, text.strip())
+        self.suggestion_model.setStringList(suggestions)
+        if suggestions:
+            self.complete()
+        else:
+            self.popup().hide()